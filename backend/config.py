@@ -8,6 +8,20 @@ load_dotenv()
 class Settings(BaseSettings):
     MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://localhost:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "survey_platform")
+    # Connection pool (per worker process; 0 means the driver default / no limit).
+    # Compressors are tried in order and skipped when their package isn't installed.
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGO_COMPRESSORS: str = os.getenv("MONGO_COMPRESSORS", "zstd,snappy")
+    MONGO_READ_PREFERENCE: str = os.getenv("MONGO_READ_PREFERENCE", "primary")
+    # Reads of analytics and listing endpoints (respondent and webhook flows stay on the primary);
+    # max staleness must be 0 (unbounded) or at least 90 seconds
+    MONGO_ANALYTICS_READ_PREFERENCE: str = os.getenv("MONGO_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+    MONGO_ANALYTICS_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGO_ANALYTICS_MAX_STALENESS_SECONDS", "120"))
+    MONGO_WARMUP_TIMEOUT_SECONDS: float = float(os.getenv("MONGO_WARMUP_TIMEOUT_SECONDS", "10"))
 
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
@@ -19,6 +33,75 @@ class Settings(BaseSettings):
 
     GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID", "")
 
+    # Password hashing: bcrypt cost factor and size of the hashing thread pool
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
+    # Token generation: insert_many chunk size, and the largest batch whose
+    # token strings are still returned inline from survey creation
+    TOKEN_INSERT_BATCH_SIZE: int = int(os.getenv("TOKEN_INSERT_BATCH_SIZE", "5000"))
+    TOKEN_INLINE_RESPONSE_LIMIT: int = int(os.getenv("TOKEN_INLINE_RESPONSE_LIMIT", "5000"))
+    # Token checksum key (kept apart from SECRET_KEY; required unless pre-codec tokens are accepted,
+    # set it to the old SECRET_KEY to keep tokens issued before it existed valid)
+    # and whether pre-codec uuid tokens are still accepted
+    TOKEN_CODEC_SECRET: str = os.getenv("TOKEN_CODEC_SECRET", "")
+    TOKEN_ACCEPT_LEGACY: bool = os.getenv("TOKEN_ACCEPT_LEGACY", "true").lower() == "true"
+
+    # Authenticated principal cache (per worker process). The TTL is how long a deactivated
+    # user or role change can go unnoticed on workers other than the one that made the change
+    PRINCIPAL_CACHE_TTL_SECONDS: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "5"))
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "1024"))
+
+    # Excel template import worker processes
+    TEMPLATE_IMPORT_WORKERS: int = int(os.getenv("TEMPLATE_IMPORT_WORKERS", "2"))
+
+    # Response exports: Mongo cursor batch and Parquet row group sizes
+    RESPONSE_EXPORT_BATCH_SIZE: int = int(os.getenv("RESPONSE_EXPORT_BATCH_SIZE", "1000"))
+    RESPONSE_EXPORT_ROW_GROUP_SIZE: int = int(os.getenv("RESPONSE_EXPORT_ROW_GROUP_SIZE", "10000"))
+
+    # Columnar answer analytics (per worker process)
+    ANSWER_CACHE_MAX_SURVEYS: int = int(os.getenv("ANSWER_CACHE_MAX_SURVEYS", "16"))
+    ANSWER_CACHE_REFRESH_SECONDS: float = float(os.getenv("ANSWER_CACHE_REFRESH_SECONDS", "5"))
+    CROSSTAB_MAX_TABLES: int = int(os.getenv("CROSSTAB_MAX_TABLES", "256"))
+
+    # Respondent gateway cache (per worker process)
+    SURVEY_CACHE_TTL_SECONDS: int = int(os.getenv("SURVEY_CACHE_TTL_SECONDS", "60"))
+    SURVEY_CACHE_MAX_ENTRIES: int = int(os.getenv("SURVEY_CACHE_MAX_ENTRIES", "512"))
+    # Decoded template snapshots (immutable, so LRU only)
+    SNAPSHOT_CACHE_MAX_ENTRIES: int = int(os.getenv("SNAPSHOT_CACHE_MAX_ENTRIES", "128"))
+
+    # Google Form webhook ingestion: "inline" persists per request, "queued" batches in the background
+    WEBHOOK_INGEST_MODE: str = os.getenv("WEBHOOK_INGEST_MODE", "inline")
+    WEBHOOK_QUEUE_MAX_SIZE: int = int(os.getenv("WEBHOOK_QUEUE_MAX_SIZE", "5000"))
+    WEBHOOK_BATCH_SIZE: int = int(os.getenv("WEBHOOK_BATCH_SIZE", "200"))
+    WEBHOOK_BATCH_MAX_WAIT_MS: int = int(os.getenv("WEBHOOK_BATCH_MAX_WAIT_MS", "50"))
+    # Webhook delivery deduplication window and per-process recent-key cache
+    WEBHOOK_IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("WEBHOOK_IDEMPOTENCY_TTL_SECONDS", "86400"))
+    WEBHOOK_IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("WEBHOOK_IDEMPOTENCY_CACHE_SIZE", "10000"))
+    # A delivery still pending after this long is assumed lost (worker died) and a retry may take it over
+    WEBHOOK_IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: int = int(os.getenv("WEBHOOK_IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", "300"))
+
+    # Orphan submissions: raw records and per-minute counters expire separately
+    ORPHAN_RETENTION_DAYS: int = int(os.getenv("ORPHAN_RETENTION_DAYS", "30"))
+    ORPHAN_COUNTER_RETENTION_DAYS: int = int(os.getenv("ORPHAN_COUNTER_RETENTION_DAYS", "90"))
+    ORPHAN_PAYLOAD_MAX_BYTES: int = int(os.getenv("ORPHAN_PAYLOAD_MAX_BYTES", "4096"))
+
+    # Logging: "json" lines or "text"; access log sampling (5xx, failures and slow requests are always logged)
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    ACCESS_LOG_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.01"))
+    ACCESS_LOG_CLIENT_ERROR_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_CLIENT_ERROR_SAMPLE_RATE", "1.0"))
+    ACCESS_LOG_SLOW_MS: int = int(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+
+    # Prometheus text metrics at /metrics (per worker process)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # MongoDB command profiler (per worker process): operations slower than
+    # QUERY_PROFILER_SLOW_MS are logged; totals are kept for up to MAX_SHAPES shapes
+    QUERY_PROFILER_ENABLED: bool = os.getenv("QUERY_PROFILER_ENABLED", "true").lower() == "true"
+    QUERY_PROFILER_TOP_N: int = int(os.getenv("QUERY_PROFILER_TOP_N", "50"))
+    QUERY_PROFILER_SLOW_MS: float = float(os.getenv("QUERY_PROFILER_SLOW_MS", "200"))
+    QUERY_PROFILER_MAX_SHAPES: int = int(os.getenv("QUERY_PROFILER_MAX_SHAPES", "2000"))
+
     class Config:
         env_file = ".env"
 
@@ -1,18 +1,139 @@
+import asyncio
+import importlib.util
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from backend.config import settings
+from backend.utils.logging_utils import logger
+from backend.utils.pool_monitor import pool_monitor
+from backend.utils.query_profiler import query_profiler
+
+# Wire compressors and the package each one needs (zlib ships with Python)
+_COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+
+def available_compressors(requested: str) -> List[str]:
+    """The requested compressors whose package is importable, in the requested order."""
+    compressors = []
+    for name in (c.strip() for c in requested.split(",")):
+        if name not in _COMPRESSOR_PACKAGES:
+            continue
+        package = _COMPRESSOR_PACKAGES[name]
+        if package is None or importlib.util.find_spec(package) is not None:
+            compressors.append(name)
+    return compressors
+
+
+_READ_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(mode: str, max_staleness_seconds: int = 0):
+    """Read preference for a mode name; max staleness (0 = unbounded) applies to non-primary modes."""
+    if mode not in _READ_MODES:
+        raise ValueError(f"Unknown read preference {mode!r}; expected one of {', '.join(_READ_MODES)}")
+    if mode == "primary":
+        return Primary()
+    return _READ_MODES[mode](max_staleness=max_staleness_seconds or -1)
+
+
+# Read route of the current request: "default" follows MONGO_READ_PREFERENCE,
+# "primary" and "analytics" are set per router through reads_from()
+read_route: ContextVar[str] = ContextVar("read_route", default="default")
+
 
 class Database:
     client: AsyncIOMotorClient = None
     db = None
 
     def connect(self):
-        self.client = AsyncIOMotorClient(settings.MONGO_URI)
+        listeners = [pool_monitor]
+        if settings.QUERY_PROFILER_ENABLED:
+            listeners.append(query_profiler)
+        options = {
+            "maxPoolSize": settings.MONGO_MAX_POOL_SIZE or None,
+            "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+            "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS or None,
+            "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+            "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "readPreference": settings.MONGO_READ_PREFERENCE,
+        }
+        compressors = available_compressors(settings.MONGO_COMPRESSORS)
+        if compressors:
+            options["compressors"] = ",".join(compressors)
+        self.client = AsyncIOMotorClient(settings.MONGO_URI, event_listeners=listeners, **options)
         self.db = self.client[settings.DATABASE_NAME]
+        self._routes = {
+            "default": self.db,
+            "primary": self.client.get_database(settings.DATABASE_NAME, read_preference=Primary()),
+            "analytics": self.client.get_database(
+                settings.DATABASE_NAME,
+                read_preference=read_preference(
+                    settings.MONGO_ANALYTICS_READ_PREFERENCE, settings.MONGO_ANALYTICS_MAX_STALENESS_SECONDS
+                )
+            ),
+        }
+
+    async def ping(self, timeout: Optional[float] = None) -> float:
+        """Round-trip time of a ping in milliseconds; raises if the server can't be reached in time."""
+        start = time.perf_counter()
+        await asyncio.wait_for(self.client.admin.command("ping"), timeout)
+        return (time.perf_counter() - start) * 1000
+
+    async def warm_up(self):
+        """
+        Pings once to select a server, then holds MONGO_MIN_POOL_SIZE pings in
+        flight together so that many connections are open before the first
+        request arrives. A failure is logged, not raised: the app still starts
+        and /health/ready reports not ready until a ping succeeds.
+        """
+        start = time.perf_counter()
+        try:
+            await self.ping(settings.MONGO_WARMUP_TIMEOUT_SECONDS)
+            if settings.MONGO_MIN_POOL_SIZE > 1:
+                await asyncio.wait_for(
+                    asyncio.gather(*(self.client.admin.command("ping") for _ in range(settings.MONGO_MIN_POOL_SIZE))),
+                    settings.MONGO_WARMUP_TIMEOUT_SECONDS
+                )
+        except Exception as e:
+            logger.error(f"MongoDB warm-up failed: {e}")
+            return
+        logger.info(
+            f"MongoDB warm-up done in {(time.perf_counter() - start) * 1000:.1f}ms",
+            extra={"pool": pool_monitor.stats()}
+        )
 
     def close(self):
         self.client.close()
 
+    @contextmanager
+    def reads(self, route: str):
+        """Routes reads through `route` ("default", "primary" or "analytics") inside the block."""
+        token = read_route.set(route)
+        try:
+            yield
+        finally:
+            read_route.reset(token)
+
     def get_collection(self, collection_name: str):
-        return self.db[collection_name]
+        # Writes always go to the primary; the route only changes where reads are served
+        return self._routes[read_route.get()][collection_name]
+
+
+def reads_from(route: str):
+    """FastAPI dependency routing every read made while handling the request through `route`."""
+    async def dependency():
+        with db.reads(route):
+            yield
+    return dependency
 
 db = Database()
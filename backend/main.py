@@ -1,19 +1,42 @@
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from backend.config import settings
 from backend.database import db
-from backend.routers import auth, templates, surveys, tokens, public, webhook, analytics, users
-from backend.utils.logging_utils import setup_logging, LoggingMiddleware
+from backend.routers import auth, templates, surveys, tokens, public, webhook, analytics, users, admin, health
+from backend.utils.logging_utils import setup_logging, shutdown_logging, LoggingMiddleware
+from backend.services.webhook_ingest import webhook_ingest_queue
+from backend.utils.security import password_pool
+from backend.services.template_import import template_import_service
+from backend.services.answer_cache import answer_cache
+from backend.services.crosstab_engine import crosstab_engine
+from backend.services.principal_cache import principal_cache
+from backend.services.snapshot_service import snapshot_service
+from backend.services.survey_cache import survey_cache
+from backend.utils.metrics import metrics
+from backend.utils.pool_monitor import pool_monitor
+from backend.utils import token_codec
+from backend.utils.migrations import startup_migrations
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     setup_logging()
+    token_codec.check_config()
     db.connect()
+    await db.warm_up()
+    await startup_migrations.run(db.db)
+    if settings.WEBHOOK_INGEST_MODE == "queued":
+        webhook_ingest_queue.start()
     try:
         yield
     finally:
+        await webhook_ingest_queue.stop()
+        password_pool.shutdown()
+        template_import_service.shutdown()
         db.close()
+        shutdown_logging()
 
 app = FastAPI(title="Survey Platform API", lifespan=lifespan)
 
@@ -49,7 +72,23 @@ app.include_router(public.router)
 app.include_router(webhook.router)
 app.include_router(analytics.router)
 app.include_router(users.router)
+app.include_router(admin.router)
+app.include_router(health.router)
 
 @app.get("/")
 async def root():
     return {"message": "Survey Platform API is running"}
+
+if settings.METRICS_ENABLED:
+    metrics.register_stats("answer_cache", answer_cache.stats)
+    metrics.register_stats("crosstab_engine", crosstab_engine.stats)
+    metrics.register_stats("principal_cache", principal_cache.stats)
+    metrics.register_stats("snapshot_cache", snapshot_service.stats)
+    metrics.register_stats("survey_cache", survey_cache.stats)
+    metrics.register_stats("webhook_queue", webhook_ingest_queue.stats)
+    metrics.register_stats("password_pool", password_pool.stats)
+    metrics.register_stats("mongo_pool", pool_monitor.stats)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -55,8 +55,11 @@ class SurveyBase(BaseModel):
     company_name: str
     template_id: str
     template_version: int
-    template_snapshot_schema: Dict[str, Any]
-    template_snapshot_questions: List[Dict[str, Any]]
+    # Content-addressed snapshot in `template_snapshots`; the inline fields are
+    # only stored on legacy surveys and filled from the snapshot when served
+    template_snapshot_id: Optional[str] = None
+    template_snapshot_schema: Dict[str, Any] = {}
+    template_snapshot_questions: List[Dict[str, Any]] = []
     customizations: Customization
     layer1_rules: Layer1Rules
     google_form_id: str
@@ -64,7 +67,8 @@ class SurveyBase(BaseModel):
     status: str = "draft" # draft, active, closed
     link_count: int = 0
     template_snapshot_l2: Optional[Dict[str, Any]] = None
-    generated_tokens: Optional[List[str]] = None
+    generated_tokens: Optional[List[str]] = None  # legacy: new surveys only record token_batch_id
+    token_batch_id: Optional[str] = None
     is_deleted: bool = False
 
 
@@ -92,6 +96,24 @@ class Survey(SurveyBase, MongoBaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class SurveySummary(MongoBaseModel):
+    """Listing view of a survey: no snapshot or token fields, plus token status counts."""
+    company_name: str
+    template_id: str
+    template_version: int = 1
+    status: str = "draft"
+    link_count: int = 0
+    created_at: Optional[datetime] = None
+    counts: Dict[str, int] = Field(default_factory=dict)
+
+
+class SurveyPage(BaseModel):
+    items: List[SurveySummary]
+    page_size: int
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
 # Token Models
 class TokenBase(BaseModel):
     survey_id: str
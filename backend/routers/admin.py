@@ -0,0 +1,47 @@
+import json
+from typing import Annotated, Literal
+
+from bson import json_util
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pymongo.errors import OperationFailure
+
+from backend.database import db
+from backend.models import User
+from backend.routers.auth import get_current_active_admin
+from backend.utils.query_profiler import query_profiler
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/queries")
+async def get_query_profile(
+    admin: Annotated[User, Depends(get_current_active_admin)],
+    limit: int = Query(50, ge=1, le=500)
+):
+    """MongoDB operations of this worker by total time, plus the slowest individual operations."""
+    return query_profiler.report(limit)
+
+@router.get("/queries/{shape_id}/explain")
+async def explain_query_shape(
+    shape_id: str,
+    admin: Annotated[User, Depends(get_current_active_admin)],
+    verbosity: Literal["queryPlanner", "executionStats", "allPlansExecution"] = "queryPlanner"
+):
+    """Replays the last command seen for a query shape through explain() (never applies writes)."""
+    sample = query_profiler.explain_command(shape_id)
+    if sample is None:
+        raise HTTPException(status_code=404, detail="No explainable command recorded for this shape")
+    command_name, command = sample
+    try:
+        plan = await db.db.command({"explain": command, "verbosity": verbosity})
+    except OperationFailure as e:
+        raise HTTPException(status_code=400, detail=f"explain failed: {e.details.get('errmsg', str(e)) if e.details else str(e)}")
+    return {
+        "shape_id": shape_id,
+        "command": command_name,
+        "explain": json.loads(json_util.dumps(plan, json_options=json_util.RELAXED_JSON_OPTIONS))
+    }
+
+@router.delete("/queries")
+async def reset_query_profile(admin: Annotated[User, Depends(get_current_active_admin)]):
+    query_profiler.reset()
+    return {"status": "success"}
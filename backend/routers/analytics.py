@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Annotated, Dict, Any, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Annotated, Dict, Any, List, Optional, Literal
 from bson import ObjectId
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from backend.models import User
-from backend.database import db
-from backend.routers.auth import get_current_user
+from backend.database import db, reads_from
+from backend.routers.auth import get_current_user, get_current_active_admin
+from backend.services.stats_service import survey_stats_service
+from backend.services.rollup_service import rollup_service, range_for
+from backend.services.answer_cache import answer_cache, summarize
+from backend.services.crosstab_engine import crosstab_engine
+from backend.services.demographics_service import DEMOGRAPHICS
+from backend.services.orphan_service import orphan_service
 
-router = APIRouter(prefix="/analytics", tags=["analytics"])
+# Dashboards tolerate bounded replication lag, so their reads can go to secondaries
+router = APIRouter(prefix="/analytics", tags=["analytics"], dependencies=[Depends(reads_from("analytics"))])
 
 @router.get("/funnel/{survey_id}")
 async def get_funnel_analytics(
@@ -17,33 +25,8 @@ async def get_funnel_analytics(
     if not ObjectId.is_valid(survey_id):
         raise HTTPException(status_code=400, detail="Invalid survey ID")
         
-    pipeline = [
-        {"$match": {"survey_id": survey_id}},
-        {
-            "$group": {
-                "_id": "$status",
-                "count": {"$sum": 1}
-            }
-        }
-    ]
-    
-    results = await db.get_collection("tokens").aggregate(pipeline).to_list(100)
+    stats = await survey_stats_service.get_counts(survey_id)
     
-    stats = {
-        "unused": 0,
-        "passed": 0,
-        "failed": 0,
-        "submitted": 0,
-        "total": 0
-    }
-    
-    for item in results:
-        status_val = item["_id"]
-        count = item["count"]
-        if status_val in stats:
-            stats[status_val] = count
-            stats["total"] += count
-            
     # Calculate Rates
     total_engaged = stats["passed"] + stats["failed"]
     stats["qualification_rate"] = (stats["passed"] / total_engaged * 100) if total_engaged > 0 else 0
@@ -52,65 +35,127 @@ async def get_funnel_analytics(
     
     return stats
 
+@router.post("/stats/rebuild", dependencies=[Depends(reads_from("primary"))])
+async def rebuild_survey_stats(
+    admin: Annotated[User, Depends(get_current_active_admin)],
+    survey_id: Optional[str] = None
+):
+    """Reconciles the materialized token counters with the `tokens` collection."""
+    rebuilt = await survey_stats_service.rebuild(survey_id)
+    return {"status": "success", "surveys_rebuilt": rebuilt}
+
+@router.post("/trends/backfill", dependencies=[Depends(reads_from("primary"))])
+async def backfill_survey_trends(
+    admin: Annotated[User, Depends(get_current_active_admin)],
+    survey_id: Optional[str] = None
+):
+    """Fills in trend rollups for the time before they were recorded; recorded buckets are left as they are."""
+    rollup_buckets = await rollup_service.backfill(survey_id)
+    return {"status": "success", "rollup_buckets": rollup_buckets}
+
 @router.get("/trends/{survey_id}")
 async def get_survey_trends(
     survey_id: str,
     current_user: Annotated[User, Depends(get_current_user)],
-    days: int = 30
+    days: int = 30,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tz: str = "UTC",
+    granularity: Literal["day", "hour"] = "day"
 ):
+    """
+    Status changes per day (or hour) by when they happened, served from the
+    pre-aggregated rollups. `start`/`end` override `days`; naive values are
+    read in `tz`, which also sets the bucket boundaries.
+    """
     if not ObjectId.is_valid(survey_id):
         raise HTTPException(status_code=400, detail="Invalid survey ID")
-        
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    pipeline = [
-        {
-            "$match": {
-                "survey_id": survey_id,
-                "created_at": {"$gte": start_date}
-            }
-        },
-        {
-            "$project": {
-                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
-                "status": 1
-            }
-        },
-        {
-            "$group": {
-                "_id": "$day",
-                "submissions": {"$sum": {"$cond": [{"$eq": ["$status", "submitted"]}, 1, 0]}},
-                "passed": {"$sum": {"$cond": [{"$eq": ["$status", "passed"]}, 1, 0]}},
-                "failed": {"$sum": {"$cond": [{"$eq": ["$status", "failed"]}, 1, 0]}}
-            }
-        },
-        {"$sort": {"_id": 1}}
-    ]
-    
-    trends = await db.get_collection("tokens").aggregate(pipeline).to_list(100)
+
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown time zone: {tz}")
+
+    start_utc, end_utc = range_for(days, start, end, zone)
+    buckets = await rollup_service.series(survey_id, start_utc, end_utc, zone, granularity)
     
-    for day in trends:
+    trends = []
+    for bucket in buckets:
+        day = {
+            "_id": bucket["_id"],
+            "submissions": bucket.get("submitted", 0),
+            "passed": bucket.get("passed", 0),
+            "failed": bucket.get("failed", 0),
+            "created": bucket.get("created", 0)
+        }
         total_attempts = day["passed"] + day["failed"]
         day["pass_rate"] = (day["passed"] / total_attempts * 100) if total_attempts > 0 else 0
+        trends.append(day)
         
     return trends
 
+async def _survey_answers(survey_id: str):
+    if not ObjectId.is_valid(survey_id):
+        raise HTTPException(status_code=400, detail="Invalid survey ID")
+    return await answer_cache.get(survey_id)
+
+def _question_column(answers, question_id: str):
+    values = answers.column(question_id)
+    if values is None:
+        raise HTTPException(status_code=404, detail=f"No numeric answers for question {question_id}")
+    return values
+
+@router.get("/answers/{survey_id}")
+async def get_answer_summary(
+    survey_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+    question_id: Optional[str] = None,
+    scale_max: int = Query(5, ge=1),
+    top_boxes: int = Query(1, ge=1)
+):
+    """
+    Mean, top-box share (answers >= scale_max - top_boxes + 1) and histogram
+    of every numerically answered Layer 2 question (or just `question_id`),
+    from the columnar answer cache.
+    """
+    answers = await _survey_answers(survey_id)
+    question_ids = [question_id] if question_id else answers.question_ids()
+    return {
+        "responses": answers.size,
+        "questions": {
+            q_id: summarize(_question_column(answers, q_id), scale_max, top_boxes)
+            for q_id in question_ids
+        }
+    }
+
+@router.get("/answers/{survey_id}/crosstab")
+async def get_answer_crosstab(
+    survey_id: str,
+    question_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+    by: Literal[DEMOGRAPHICS] = "gender",
+    scale_max: int = Query(5, ge=1),
+    top_boxes: int = Query(1, ge=1)
+):
+    """
+    One question broken down by respondent gender, age_range or area. Tables
+    are updated incrementally and reused until the survey gets new responses.
+    """
+    if not ObjectId.is_valid(survey_id):
+        raise HTTPException(status_code=400, detail="Invalid survey ID")
+    result = await crosstab_engine.crosstab(survey_id, question_id, by, scale_max, top_boxes)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No numeric answers for question {question_id}")
+    return {"question_id": question_id, "by": by, **result}
+
 @router.get("/orphans")
 async def get_orphan_summary(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(get_current_user)],
+    hours: Optional[int] = Query(None, ge=1)
 ):
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$reason",
-                "count": {"$sum": 1},
-                "latest_attempt": {"$max": "$timestamp"}
-            }
-        },
-        {"$sort": {"count": -1}}
-    ]
-    
-    orphans = await db.get_collection("orphan_submissions").aggregate(pipeline).to_list(100)
+    """Orphan counts per reason over the last `hours` (default: the whole counter retention)."""
+    since = datetime.utcnow() - timedelta(hours=hours) if hours else None
+    orphans = await orphan_service.summary(since)
     total_orphans = sum(item["count"] for item in orphans)
     
     return {
@@ -118,12 +163,24 @@ async def get_orphan_summary(
         "categories": orphans
     }
 
+@router.get("/orphans/timeline")
+async def get_orphan_timeline(
+    current_user: Annotated[User, Depends(get_current_user)],
+    hours: int = Query(24, ge=1, le=24 * 90),
+    reason: Optional[str] = None,
+    granularity: Literal["minute", "hour"] = "hour"
+):
+    """Orphan counts per minute or hour and reason, from the per-minute counters."""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    return await orphan_service.timeline(since, reason, granularity)
+
 @router.get("/orphans/{reason}")
 async def get_orphan_details(
     reason: str,
     current_user: Annotated[User, Depends(get_current_user)],
-    limit: int = 10
+    limit: int = Query(10, ge=1, le=200)
 ):
+    # Served by the (reason, timestamp) index
     logs = await db.get_collection("orphan_submissions")\
         .find({"reason": reason})\
         .sort("timestamp", -1)\
@@ -4,16 +4,18 @@ from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
+from bson import ObjectId
 
 from backend.config import settings
 from backend.database import db
 from backend.models import TokenData, User, UserCreate, UserInDB
 from backend.utils.security import (
     create_access_token,
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_and_update_password,
 )
 from backend.utils.logging_utils import logger
+from backend.services.principal_cache import principal_cache
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -39,7 +41,7 @@ async def _create_user(user_in: UserCreate) -> User:
             detail="Username already registered",
         )
 
-    hashed_pw = get_password_hash(user_in.password)
+    hashed_pw = await get_password_hash_async(user_in.password)
     doc = {
         "username": user_in.username,
         "email": user_in.email,
@@ -71,11 +73,20 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Use
     except JWTError:
         raise credentials_exception
 
-    user_in_db = await _get_user(token_data.username)
-    if not user_in_db or not user_in_db.is_active:
+    cache_key = (token_data.username, str(payload.get("jti") or payload.get("iat") or payload.get("exp")))
+    cached = principal_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    raw = await db.get_collection("users").find_one(
+        {"username": token_data.username}, {"hashed_password": 0}
+    )
+    if not raw or not raw.get("is_active", True):
         raise credentials_exception
 
-    return User(**user_in_db.model_dump())
+    user = User(**raw)
+    principal_cache.set(cache_key, user)
+    return user
     
 async def get_current_active_admin(current_user: Annotated[User, Depends(get_current_user)]) -> User:
     if current_user.role != "admin":
@@ -129,9 +140,12 @@ async def login_for_access_token(
         await _create_user(seed_user)
         user_in_db = await _get_user(form_data.username)
 
-    if not user_in_db or not verify_password(
-        form_data.password, user_in_db.hashed_password
-    ):
+    valid, new_hash = (False, None)
+    if user_in_db:
+        valid, new_hash = await verify_and_update_password(
+            form_data.password, user_in_db.hashed_password
+        )
+    if not valid:
         logger.warning(f"Login failure for user: {form_data.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -139,6 +153,13 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Transparently upgrade hashes made with an outdated cost factor
+    if new_hash:
+        await db.get_collection("users").update_one(
+            {"_id": ObjectId(user_in_db.id)}, {"$set": {"hashed_password": new_hash}}
+        )
+        logger.info(f"Rehashed password for user: {user_in_db.username}")
+
     logger.info(f"User logged in: {user_in_db.username}")
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from backend.database import db
+from backend.utils.pool_monitor import pool_monitor
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+# Readiness must answer well inside a load balancer's probe timeout
+READY_PING_TIMEOUT_SECONDS = 2
+
+@router.get("/live")
+async def liveness():
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def readiness():
+    """200 when MongoDB answers a ping, 503 otherwise; includes this worker's pool counters."""
+    try:
+        ping_ms = await db.ping(READY_PING_TIMEOUT_SECONDS)
+    except Exception as e:
+        # Unauthenticated endpoint: name the failure without echoing topology details
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "error": type(e).__name__, "pools": pool_monitor.pools()}
+        )
+    return {"status": "ready", "ping_ms": round(ping_ms, 2), "pools": pool_monitor.pools()}
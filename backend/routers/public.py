@@ -1,18 +1,31 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from typing import Dict, Any, List
 from bson import ObjectId
 from datetime import datetime
 
-from backend.database import db
+from backend.database import db, reads_from
 from backend.models import Token, Survey, Response
+from backend.services.survey_cache import survey_cache
+from backend.services.screening import compile_screening
+from backend.services.snapshot_service import snapshot_service
+from backend.services.answer_cache import answer_cache
+from backend.services.demographics_service import demographics_service
+from backend.utils import token_codec
 
-router = APIRouter(prefix="/s", tags=["public"])
+# Respondents read what they just wrote (Layer 1 then Layer 2), so they always read the primary
+router = APIRouter(prefix="/s", tags=["public"], dependencies=[Depends(reads_from("primary"))])
 
 class Layer1Response(BaseModel):
     answers: Dict[str, Any]
     phone: str
 
+def _precheck_token(token: str) -> str:
+    """Rejects malformed or forged tokens before any database lookup and returns the canonical spelling."""
+    if not token_codec.is_plausible(token):
+        raise HTTPException(status_code=404, detail="Invalid token")
+    return token_codec.normalize(token)
+
 def extract_layer1_questions(doc: dict) -> list:
     """Robustly extract questions from both legacy and structured template formats."""
     questions = doc.get("layer1_questions", [])
@@ -46,28 +59,10 @@ def extract_layer1_questions(doc: dict) -> list:
             deduped.append(q)
     return deduped
 
-@router.get("/{token}")
-async def get_survey_by_token(token: str):
-    token_doc = await db.get_collection("tokens").find_one({"token": token})
-    
-    if not token_doc:
-        raise HTTPException(status_code=404, detail="Invalid token")
-    
-    if token_doc["status"] == "submitted":
-        raise HTTPException(status_code=403, detail="Survey already completed for this link")
-    
-    if token_doc["status"] == "failed":
-        raise HTTPException(status_code=403, detail="Validation failed for this link")
-    
-    survey_id = token_doc["survey_id"]
-    survey = await db.get_collection("surveys").find_one({"_id": ObjectId(survey_id)})
-    
-    if not survey:
-        raise HTTPException(status_code=404, detail="Survey not found")
-    
-    # Fetch template for fallback and name
-    template_doc = await db.get_collection("templates").find_one({"_id": ObjectId(survey["template_id"])})
-    
+def build_gateway_payload(survey: dict, template_doc: dict | None) -> dict:
+    """Builds the respondent-facing Layer 1 payload for a survey."""
+    survey_id = str(survey["_id"])
+
     # Robust question extraction with fallback to template
     questions = survey.get("template_snapshot_questions", [])
     if not questions and template_doc:
@@ -126,8 +121,53 @@ async def get_survey_by_token(token: str):
         "google_form_url": survey.get("google_form_url")
     }
 
+async def get_survey_entry(survey_id: str) -> dict:
+    """
+    Returns the cached gateway entry for a survey, loading the survey and its
+    template from MongoDB on a miss.
+    """
+    entry = survey_cache.get(survey_id)
+    if entry is not None:
+        return entry
+
+    survey = await db.get_collection("surveys").find_one({"_id": ObjectId(survey_id)})
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    # Copies the shared snapshot in, so building the payload can't alter the cached one
+    survey = await snapshot_service.resolve(survey)
+    
+    # Fetch template for fallback and name
+    template_doc = await db.get_collection("templates").find_one({"_id": ObjectId(survey["template_id"])})
+
+    payload = build_gateway_payload(survey, template_doc)
+    entry = {
+        "template_id": str(survey["template_id"]),
+        "payload": payload,
+        "screening": compile_screening(survey, payload["questions"]),
+    }
+    survey_cache.set(survey_id, entry)
+    return entry
+
+@router.get("/{token}")
+async def get_survey_by_token(token: str):
+    token = _precheck_token(token)
+    token_doc = await db.get_collection("tokens").find_one({"token": token})
+    
+    if not token_doc:
+        raise HTTPException(status_code=404, detail="Invalid token")
+    
+    if token_doc["status"] == "submitted":
+        raise HTTPException(status_code=403, detail="Survey already completed for this link")
+    
+    if token_doc["status"] == "failed":
+        raise HTTPException(status_code=403, detail="Validation failed for this link")
+    
+    entry = await get_survey_entry(token_doc["survey_id"])
+    return entry["payload"]
+
 @router.post("/{token}/layer2")
 async def submit_layer2(token: str, answers: Dict[str, Any]):
+    token = _precheck_token(token)
     token_doc = await db.get_collection("tokens").find_one({"token": token})
     if not token_doc:
         raise HTTPException(status_code=404, detail="Invalid token")
@@ -146,15 +186,17 @@ async def submit_layer2(token: str, answers: Dict[str, Any]):
     }
     
     await db.get_collection("responses").insert_one(response_doc)
+    answer_cache.mark_stale(response_doc["survey_id"])
     
     # Update token status to submitted
     from backend.services.token_service import token_service
-    await token_service.update_token_status(token, "submitted")
+    await token_service.transition(token, "submitted")
     
     return {"status": "success", "message": "Evaluation submitted successfully"}
 
 @router.post("/{token}/layer1")
 async def submit_layer1(token: str, response: Layer1Response):
+    token = _precheck_token(token)
     token_doc = await db.get_collection("tokens").find_one({"token": token})
     
     if not token_doc:
@@ -167,40 +209,22 @@ async def submit_layer1(token: str, response: Layer1Response):
         raise HTTPException(status_code=403, detail="Validation failed for this link")
     
     survey_id = token_doc["survey_id"]
-    survey = await db.get_collection("surveys").find_one({"_id": ObjectId(survey_id)})
+    entry = await get_survey_entry(survey_id)
     
-    if not survey:
-        raise HTTPException(status_code=404, detail="Survey not found")
-    
-    # Validate Layer 1 against Template "Correct Answers"
-    questions = survey.get("template_snapshot_questions", [])
+    # Validate Layer 1 against the survey's compiled screening rules
     answers = response.answers
     phone = response.phone
-    passed = True
-    fail_reason = ""
     
     from backend.utils.logging_utils import logger
-    logger.info(f"--- VALIDATING LAYER 1 | Token: {token} | Answers: {answers} ---")
+    logger.debug(f"Validating Layer 1 for token {token}")
     
-    # Iterate through all questions that have a defined correct_answer
-    for q in questions:
-        q_id = q.get("id")
-        correct_val = q.get("correct_answer")
-        
-        if correct_val is not None:
-            user_val = answers.get(q_id)
-            if user_val != correct_val:
-                passed = False
-                fail_reason = f"Question {q_id}: expected '{correct_val}', got '{user_val}'"
-                break
+    passed, fail_reason = entry["screening"].evaluate(answers)
             
     if not passed:
         logger.warning(f"Validation FAILED for token {token}: {fail_reason}")
         # Mark token as failed
-        await db.get_collection("tokens").update_one(
-            {"_id": token_doc["_id"]},
-            {"$set": {"status": "failed", "layer1_passed": False, "phone": phone}}
-        )
+        from backend.services.token_service import token_service
+        await token_service.transition(token, "failed", {"layer1_passed": False, "phone": phone})
         return {"passed": False, "message": "You do not qualify for this study."}
     
     logger.info(f"Validation PASSED for token {token}")
@@ -210,18 +234,14 @@ async def submit_layer1(token: str, response: Layer1Response):
     # If passes, redirect to Google Form.
     # Token is marked as used when Google Form submits via webhook.
     
-    # Update phone number and transition to 'passed'
+    # Update phone number and transition to 'passed' in one write
     from backend.services.token_service import token_service
-    await token_service.update_token_status(token, "passed")
-    await db.get_collection("tokens").update_one(
-        {"token": token},
-        {"$set": {"phone": response.phone}}
-    )
+    await token_service.transition(token, "passed", {"layer1_passed": True, "phone": phone})
     
     # Construct Google Form URL with prefilled token
     # Assuming the Google Form has a prefilled entry for token
     # URL format: https://docs.google.com/forms/d/e/ID/viewform?entry.123456=TOKEN
-    google_form_url = survey["google_form_url"]
+    google_form_url = entry["payload"]["google_form_url"]
     
     # --- STORE RESPONDENT DATA ---
     try:
@@ -257,6 +277,8 @@ async def submit_layer1(token: str, response: Layer1Response):
             },
             upsert=True
         )
+        # Per-survey copy for demographic breakdowns of this survey's answers
+        await demographics_service.record(survey_id, phone, respondent_data)
     except Exception as e:
         logger.error(f"Failed to store respondent data: {e}")
 
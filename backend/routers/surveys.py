@@ -1,16 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Annotated
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import List, Annotated, Dict, Any, Literal, Optional
 from bson import ObjectId
 
 from datetime import datetime, timedelta
-from backend.models import Survey, SurveyCreate, User, SurveyUpdate
-from backend.database import db
+from backend.models import Survey, SurveyCreate, User, SurveyUpdate, SurveyPage
+from backend.config import settings
+from backend.database import db, reads_from
 from backend.routers.auth import get_current_user
 from backend.utils.logging_utils import logger
+from backend.services.survey_cache import survey_cache
+from backend.services.stats_service import survey_stats_service
+from backend.services.snapshot_service import snapshot_service
+from backend.services.response_export import MEDIA_TYPES, answer_columns, response_export_service
+from backend.routers.public import get_survey_entry
+from backend.utils.pagination import KEYSET_SORT, encode_cursor, keyset_filter
+from backend.utils.migrations import startup_migrations
 
 router = APIRouter(prefix="/surveys", tags=["surveys"])
 
-@router.get("/stats")
+# Fields shown in survey listings; the snapshot and token fields stay on the detail endpoint
+SUMMARY_PROJECTION = {
+    "company_name": 1,
+    "template_id": 1,
+    "template_version": 1,
+    "status": 1,
+    "link_count": 1,
+    "created_at": 1
+}
+
+@router.get("/stats", dependencies=[Depends(reads_from("analytics"))])
 async def get_survey_stats(
     current_user: Annotated[User, Depends(get_current_user)]
 ):
@@ -18,19 +37,20 @@ async def get_survey_stats(
     try:
         surveys_col = db.get_collection("surveys")
         responses_col = db.get_collection("responses")
-        tokens_col = db.get_collection("tokens")
 
         # 1. Survey counts (excluding soft-deleted)
-        total_surveys = await surveys_col.count_documents({"is_deleted": {"$ne": True}})
-        active_surveys = await surveys_col.count_documents({"status": "active", "is_deleted": {"$ne": True}})
+        not_deleted = startup_migrations.not_deleted_surveys()
+        total_surveys = await surveys_col.count_documents(not_deleted)
+        active_surveys = await surveys_col.count_documents({**not_deleted, "status": "active"})
         
-        # 2. Response counts
-        total_responses = await responses_col.count_documents({})
+        # 2. Response counts (collection metadata, no scan)
+        total_responses = await responses_col.estimated_document_count()
         
-        # 3. Token counts for match rate
-        total_tokens = await tokens_col.count_documents({})
+        # 3. Token counts for match rate, from the materialized survey counters
+        token_totals = await survey_stats_service.get_totals()
+        total_tokens = token_totals["total"]
         # "Qualified" = status in [passed, submitted]
-        qualified_tokens = await tokens_col.count_documents({"status": {"$in": ["passed", "submitted"]}}) 
+        qualified_tokens = token_totals["passed"] + token_totals["submitted"]
         match_rate = (qualified_tokens / total_tokens * 100) if total_tokens > 0 else 0
         
         # 4. Engagement Volume aggregation (Monthly)
@@ -145,14 +165,16 @@ async def create_survey(
 
     logger.info(f"Extracted {len(questions)} questions for snapshot from template {template_doc.get('name')}")
 
+    # Stored once per distinct content; surveys cloned from the same template share it
+    snapshot_id = await snapshot_service.store(schema, questions, template_doc.get("layer2_structure", {}))
+
     new_survey_data = survey_in.model_dump()
     new_survey_data.update({
         "template_version": template_doc.get("version", 1),
-        "template_snapshot_schema": schema,
-        "template_snapshot_questions": questions,
-        "template_snapshot_l2": template_doc.get("layer2_structure", {}),
+        "template_snapshot_id": snapshot_id,
         "link_count": survey_in.link_count,
         "status": "draft",
+        "is_deleted": False,
         "created_at": datetime.utcnow()
     })
 
@@ -163,48 +185,70 @@ async def create_survey(
     logger.info(f"Survey {created_survey['_id']} created by {current_user.username} with {survey_in.link_count} requested links")
 
     # 4. Automated Token Generation (Link Studio Provisioning)
+    # Tokens are inserted in chunks; only the batch_id is recorded on the survey.
+    # Small batches still return their token strings inline for the Link Studio.
     link_count = survey_in.link_count
-    generated_tokens = []
     if link_count > 0:
-        import uuid
-        from datetime import timedelta
-        token_documents = []
-        batch_id = str(uuid.uuid4())[:8]
-        expires_at = datetime.utcnow() + timedelta(days=30)
+        from backend.services.token_service import token_service
+        from backend.utils import token_codec
+        batch_id = token_service.new_batch_id()
+        keep_inline = link_count <= settings.TOKEN_INLINE_RESPONSE_LIMIT
+        generated_tokens = []
         
-        for _ in range(link_count):
-            token_str = str(uuid.uuid4())[:12].upper() # Human readable but secure enough
-            generated_tokens.append(token_str)
-            token_documents.append({
-                "survey_id": str(created_survey["_id"]),
-                "token": token_str,
-                "status": "unused",
-                "batch_id": batch_id,
-                "created_by": current_user.username,
-                "created_at": datetime.utcnow(),
-                "expires_at": expires_at,
-                "last_accessed": None
-            })
-        
-        if token_documents:
-            await db.get_collection("tokens").insert_many(token_documents)
-            # Persist these tokens in the survey document for Link Studio consistency
-            await db.get_collection("surveys").update_one(
-                {"_id": created_survey["_id"]},
-                {"$set": {"generated_tokens": generated_tokens}}
-            )
-            created_survey["generated_tokens"] = generated_tokens
-            logger.info(f"Auto-generated {link_count} tokens for survey {created_survey['_id']}")
+        async for chunk in token_service.generate_token_batches(
+            survey_id=str(created_survey["_id"]),
+            count=link_count,
+            created_by=current_user.username,
+            token_factory=lambda: token_codec.generate(str(created_survey["_id"])), # Checksummed, typo-tolerant
+            batch_id=batch_id
+        ):
+            if keep_inline:
+                generated_tokens.extend(chunk)
 
-    return created_survey
+        await db.get_collection("surveys").update_one(
+            {"_id": created_survey["_id"]},
+            {"$set": {"token_batch_id": batch_id}}
+        )
+        created_survey["token_batch_id"] = batch_id
+        created_survey["generated_tokens"] = generated_tokens if keep_inline else None
+        logger.info(f"Auto-generated {link_count} tokens in batch {batch_id} for survey {created_survey['_id']}")
+
+    return await snapshot_service.resolve(created_survey)
 
-@router.get("/", response_model=List[Survey])
+@router.get("/", response_model=SurveyPage, dependencies=[Depends(reads_from("analytics"))])
 async def list_surveys(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(get_current_user)],
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: int = Query(100, ge=1, le=500)
 ):
-    # Filter out soft-deleted surveys
-    surveys_list = await db.get_collection("surveys").find({"is_deleted": {"$ne": True}}).to_list(1000)
-    return surveys_list
+    """
+    Lists non-deleted surveys newest first as summaries with token counts.
+    Pass the returned `next_cursor` as `cursor` for the next page; the full
+    survey (snapshot included) is served by GET /surveys/{survey_id}.
+    """
+    query = startup_migrations.not_deleted_surveys()
+    if status:
+        query["status"] = status
+    if cursor:
+        query.update(keyset_filter(cursor))
+
+    # Fetch one extra row to know whether another page exists
+    surveys_list = await db.get_collection("surveys").find(query, SUMMARY_PROJECTION) \
+        .sort(KEYSET_SORT).limit(page_size + 1).to_list(page_size + 1)
+    has_more = len(surveys_list) > page_size
+    surveys_list = surveys_list[:page_size]
+
+    counts = await survey_stats_service.get_counts_many([str(s["_id"]) for s in surveys_list])
+    for survey in surveys_list:
+        survey["counts"] = counts[str(survey["_id"])]
+
+    return {
+        "items": surveys_list,
+        "page_size": page_size,
+        "next_cursor": encode_cursor(surveys_list[-1]) if has_more else None,
+        "has_more": has_more
+    }
 
 
 @router.delete("/{survey_id}")
@@ -226,6 +270,7 @@ async def delete_survey(
         {"_id": ObjectId(survey_id)},
         {"$set": {"is_deleted": True}}
     )
+    survey_cache.invalidate(survey_id)
     
     logger.info(f"Survey {survey_id} soft-deleted by {current_user.username}")
     return {"status": "success", "message": "Survey removed successfully"}
@@ -241,7 +286,63 @@ async def get_survey(
     survey = await db.get_collection("surveys").find_one({"_id": ObjectId(survey_id)})
     if survey is None:
         raise HTTPException(status_code=404, detail="Survey not found")
-    return survey
+    return await snapshot_service.resolve(survey)
+
+@router.post("/{survey_id}/screening/validate")
+async def validate_screening_batch(
+    survey_id: str,
+    answer_sets: List[Dict[str, Any]],
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """Runs the survey's compiled Layer 1 screening rules over a batch of answer sets."""
+    if not ObjectId.is_valid(survey_id):
+        raise HTTPException(status_code=400, detail="Invalid survey ID")
+
+    entry = await get_survey_entry(survey_id)
+    results = [
+        {"passed": passed, "reason": reason}
+        for passed, reason in entry["screening"].evaluate_many(answer_sets)
+    ]
+    passed_count = sum(1 for r in results if r["passed"])
+    return {
+        "rule_count": len(entry["screening"]),
+        "passed": passed_count,
+        "failed": len(results) - passed_count,
+        "results": results
+    }
+
+@router.get("/{survey_id}/responses/export")
+async def export_responses(
+    survey_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    gzip: bool = False,
+    source: Optional[str] = None
+):
+    """
+    Streams every response of a survey, one row per response with answers
+    flattened into a column per snapshot question id. `gzip` compresses
+    CSV/NDJSON output and selects the gzip codec for Parquet.
+    """
+    if not ObjectId.is_valid(survey_id):
+        raise HTTPException(status_code=400, detail="Invalid survey ID")
+
+    entry = await get_survey_entry(survey_id)
+    body = response_export_service.stream(
+        survey_id, answer_columns(entry["payload"]), format, gzip=gzip, source=source
+    )
+
+    filename = f"responses_{survey_id}.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip and format != "parquet":
+        filename += ".gz"
+        media_type = "application/gzip"
+    logger.info(f"Response export ({format}{', gzip' if gzip else ''}) of survey {survey_id} started by {current_user.username}")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @router.put("/{survey_id}", response_model=Survey)
 async def update_survey(
@@ -285,13 +386,14 @@ async def update_survey(
 
     update_data = survey_update.model_dump(exclude_unset=True)
     if not update_data:
-        return existing
+        return await snapshot_service.resolve(existing)
 
     await surveys_col.update_one(
         {"_id": ObjectId(survey_id)},
         {"$set": update_data}
     )
+    survey_cache.invalidate(survey_id)
     
     updated = await surveys_col.find_one({"_id": ObjectId(survey_id)})
     logger.info(f"Survey {survey_id} updated by {current_user.username}")
-    return updated
+    return await snapshot_service.resolve(updated)
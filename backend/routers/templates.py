@@ -1,6 +1,4 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-import pandas as pd
-import io
 from typing import List, Annotated
 from datetime import datetime
 from bson import ObjectId
@@ -8,6 +6,8 @@ from bson import ObjectId
 from backend.models import Template, TemplateCreate, User
 from backend.database import db
 from backend.routers.auth import get_current_user
+from backend.services.survey_cache import survey_cache
+from backend.services.template_import import template_import_service
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 
@@ -98,6 +98,7 @@ async def update_template(
     new_data["created_at"] = datetime.utcnow()
     
     result = await templates_col.insert_one(new_data)
+    survey_cache.invalidate_template(template_id)
     updated = await templates_col.find_one({"_id": result.inserted_id})
     return updated
 
@@ -119,136 +120,49 @@ async def delete_template(
         {"name": target["name"]},
         {"$set": {"is_deleted": True}}
     )
+    # Every version of the name is affected, so drop the whole gateway cache
+    survey_cache.clear()
     
     return {"status": "success", "message": "Template and all versions soft-deleted"}
+def _validate_upload(file: UploadFile):
+    if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(status_code=400, detail="Invalid file format")
+
 @router.post("/upload", response_model=Template)
 async def upload_template(
     current_user: Annotated[User, Depends(get_current_user)],
     file: UploadFile = File(...)
 ):
-    if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
-        raise HTTPException(status_code=400, detail="Invalid file format")
+    """Imports a questionnaire workbook and returns the created template once parsing finishes."""
+    _validate_upload(file)
     
-    try:
-        content = await file.read()
-        
-        # 1. Parse Layer 1 (Screening)
-        l1_questions = []
-        # 1. Parse Layer 1 (Screening)
-        l1_questions = []
-        try:
-            df_s = pd.read_excel(io.BytesIO(content), sheet_name="Screening")
-            current_q = None
-            
-            for _, row in df_s.iterrows():
-                row_vals = [str(x).strip() for x in row.values if str(x) != 'nan']
-                if not row_vals: continue
-                
-                # Detect Code (S1, D1, etc.)
-                code = ""
-                text = ""
-                for i, val in enumerate(row_vals):
-                    if (val.startswith(('S', 'D', 'Q')) and any(c.isdigit() for c in val) and len(val) <= 5):
-                        code = val
-                        # Heuristic: the first "long" string after the code is the label
-                        for j in range(i + 1, len(row_vals)):
-                            if len(row_vals[j]) > 5:
-                                text = row_vals[j]
-                                break
-                        break
-                
-                if code:
-                    if current_q: l1_questions.append(current_q)
-                    current_q = {"id": code, "label": text, "options": [], "type": "mcq"}
-                    # Heuristic for age: if label contains age, type is age
-                    if "age" in text.lower() or "سن" in text:
-                        current_q["type"] = "age"
-                elif current_q and row_vals:
-                    # Potential options or more label text
-                    for v in row_vals:
-                        if v and v not in [current_q["id"], current_q["label"], "Instructions"]:
-                            if len(v) < 50: # Likely an option, not another question
-                                if v not in current_q["options"]:
-                                    current_q["options"].append(v)
-            
-            if current_q: l1_questions.append(current_q)
-        except Exception as e:
-            from backend.utils.logging_utils import logger
-            logger.error(f"Screening parse failed: {str(e)}")
-            pass
+    path = await template_import_service.save_upload(file)
+    job_id = await template_import_service.create_job(file.filename, current_user.username)
+    return await template_import_service.run(job_id, path, file.filename)
 
-        # 2. Parse Layer 2 (Evaluation Sheets)
-        l2_structure = {"sections": []}
-        evaluation_sheets = [
-            'Product Attribute (Taste Test)', 
-            'Purchase Intention', 
-            'Overall Evaluation', 
-            'Awareness & Usage Module',
-            'Shopping Behavior'
-        ]
-        
-        for sheet in evaluation_sheets:
-            try:
-                df_p = pd.read_excel(io.BytesIO(content), sheet_name=sheet)
-                section = {"title": sheet, "questions": []}
-                
-                # Heuristic for question detection:
-                # Often questions are in columns with specific names or patterns
-                for _, row in df_p.iterrows():
-                    row_data = [str(x) for x in row.values if str(x) != 'nan']
-                    if not row_data: continue
-                    
-                    # Detect Question Code (e.g., Q1, PI1, OE1)
-                    code = ""
-                    text = ""
-                    
-                    # Search for code in columns 0-8
-                    for i in range(min(len(row), 10)):
-                        val = str(row.iloc[i])
-                        if val.startswith(('Q', 'PI', 'OE', 'AU', 'SB')) and any(c.isdigit() for c in val):
-                            code = val
-                            # Usually text follows a few columns later
-                            for j in range(i + 1, len(row)):
-                                t_val = str(row.iloc[j])
-                                if t_val and t_val != 'nan' and len(t_val) > 10: # Long enough to be a question
-                                    text = t_val
-                                    break
-                            break
-                    
-                    if code and text:
-                        section["questions"].append({
-                            "id": f"{sheet}_{code}",
-                            "text": text,
-                            "type": "scale" if "مدى" in text or "scale" in text.lower() else "mcq",
-                            "options": ["1", "2", "3", "4", "5"]
-                        })
-                
-                if section["questions"]:
-                    l2_structure["sections"].append(section)
-            except Exception:
-                continue
+@router.post("/import", status_code=status.HTTP_202_ACCEPTED)
+async def start_template_import(
+    current_user: Annotated[User, Depends(get_current_user)],
+    file: UploadFile = File(...)
+):
+    """Starts a background workbook import; poll GET /templates/import/{job_id} for progress."""
+    _validate_upload(file)
 
-        # 3. Create Template
-        new_template = Template(
-            name=f"Imported: {file.filename.split('.')[0]}",
-            type="taste_test",
-            version=1,
-            layer1_questions=l1_questions,
-            layer1_structure={"sections": [{"title": "Screening", "questions": l1_questions}]} if l1_questions else {"sections": []},
-            layer1_question_schema={}, # Can be generated if needed
-            layer2_structure=l2_structure,
-            created_at=datetime.utcnow()
-        )
-        
-        templates_col = db.get_collection("templates")
-        result = await templates_col.insert_one(
-            new_template.model_dump(by_alias=True, exclude=["id"])
-        )
-        created = await templates_col.find_one({"_id": result.inserted_id})
-        return created
+    path = await template_import_service.save_upload(file)
+    job_id = await template_import_service.create_job(file.filename, current_user.username)
+    template_import_service.start(job_id, path, file.filename)
+    return {"job_id": job_id, "status": "queued"}
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse file: {str(e)}")
+@router.get("/import/{job_id}")
+async def get_template_import(
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    job = await template_import_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    job["job_id"] = job.pop("_id")
+    return job
 
 @router.get("/history/{name}", response_model=List[Template])
 async def get_template_history(
@@ -291,5 +205,6 @@ async def rollback_template(
     new_data["is_deleted"] = False
     
     result = await templates_col.insert_one(new_data)
+    survey_cache.invalidate_template(template_id)
     rolled_back = await templates_col.find_one({"_id": result.inserted_id})
     return rolled_back
@@ -1,54 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import List, Annotated, Optional, AsyncIterator, Literal
 from bson import ObjectId
-import uuid
-from datetime import datetime, timedelta
+import json
+from datetime import datetime
+from backend.config import settings
 from backend.models import Token, TokenCreate, User, TokenBulkUpdate
 from backend.database import db
 from backend.routers.auth import get_current_user
+from backend.services.token_service import token_service
+from backend.services.stats_service import survey_stats_service
+from backend.utils import token_codec
+from backend.utils.pagination import KEYSET_SORT, encode_cursor, keyset_filter
 
 router = APIRouter(prefix="/tokens", tags=["tokens"])
 
+def _stream_token_rows(batches: AsyncIterator[List[str]], batch_id: str, fmt: str) -> AsyncIterator[str]:
+    """Serializes generated token chunks as NDJSON lines or CSV rows."""
+    async def rows():
+        if fmt == "csv":
+            yield "token,batch_id\n"
+        async for chunk in batches:
+            if fmt == "csv":
+                yield "".join(f"{token},{batch_id}\n" for token in chunk)
+            else:
+                yield "".join(json.dumps({"token": token, "batch_id": batch_id}) + "\n" for token in chunk)
+    return rows()
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
 @router.post("/generate", response_model=List[str])
 async def generate_tokens(
     token_request: TokenCreate,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(get_current_user)],
+    format: Literal["json", "ndjson", "csv"] = "json"
 ):
+    """
+    Generates tokens in chunked, unordered inserts. `json` returns the legacy
+    array of token strings; `ndjson`/`csv` stream each chunk as it is stored,
+    so very large batches run in constant memory.
+    """
     if not ObjectId.is_valid(token_request.survey_id):
         raise HTTPException(status_code=400, detail="Invalid survey ID")
         
-    survey = await db.get_collection("surveys").find_one({"_id": ObjectId(token_request.survey_id)})
+    survey = await db.get_collection("surveys").find_one({"_id": ObjectId(token_request.survey_id)}, {"_id": 1})
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
         
+    batch_id = token_service.new_batch_id()
+    batches = token_service.generate_token_batches(
+        survey_id=token_request.survey_id,
+        count=token_request.count,
+        created_by=current_user.username,
+        token_factory=lambda: token_codec.generate(token_request.survey_id),
+        batch_id=batch_id
+    )
+
+    if format in STREAM_MEDIA_TYPES:
+        return StreamingResponse(
+            _stream_token_rows(batches, batch_id, format),
+            media_type=STREAM_MEDIA_TYPES[format],
+            headers={"X-Batch-Id": batch_id}
+        )
+
     generated_tokens = []
-    token_documents = []
-    batch_id = str(uuid.uuid4())[:8] # Short batch ID for readability
-    
-    # Default expiry 30 days if not specified
-    expires_at = datetime.utcnow() + timedelta(days=30)
-    
-    for _ in range(token_request.count):
-        token_str = str(uuid.uuid4())
-        generated_tokens.append(token_str)
-        
-        token_doc = {
-            "survey_id": token_request.survey_id,
-            "token": token_str,
-            "status": "unused",
-            "batch_id": batch_id,
-            "created_by": current_user.username,
-            "created_at": datetime.utcnow(),
-            "expires_at": expires_at,
-            "last_accessed": None
-        }
-        token_documents.append(token_doc)
-        
-    if token_documents:
-        await db.get_collection("tokens").insert_many(token_documents)
-        
+    async for chunk in batches:
+        generated_tokens.extend(chunk)
     return generated_tokens
 
+@router.get("/batch/{batch_id}/export")
+async def export_token_batch(
+    batch_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+    format: Literal["ndjson", "csv"] = "csv"
+):
+    """Streams every token of a generation batch from a server-side cursor."""
+    cursor = db.get_collection("tokens").find(
+        {"batch_id": batch_id},
+        {"_id": 0, "token": 1},
+        batch_size=settings.TOKEN_INSERT_BATCH_SIZE
+    )
+
+    async def batches():
+        chunk = []
+        async for doc in cursor:
+            chunk.append(doc["token"])
+            if len(chunk) >= settings.TOKEN_INSERT_BATCH_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    return StreamingResponse(
+        _stream_token_rows(batches(), batch_id, format),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=tokens_{batch_id}.{format}"}
+    )
+
 @router.get("/survey/{survey_id}/summary")
 async def get_token_summary(
     survey_id: str,
@@ -57,35 +105,8 @@ async def get_token_summary(
     if not ObjectId.is_valid(survey_id):
         raise HTTPException(status_code=400, detail="Invalid survey ID")
         
-    pipeline = [
-        {"$match": {"survey_id": survey_id}},
-        {
-            "$group": {
-                "_id": "$status",
-                "count": {"$sum": 1}
-            }
-        }
-    ]
-    
-    results = await db.get_collection("tokens").aggregate(pipeline).to_list(100)
-    
     # Format counts: {unused: X, passed: Y, ...}
-    summary = {
-        "unused": 0,
-        "passed": 0,
-        "failed": 0,
-        "submitted": 0,
-        "total": 0
-    }
-    
-    for item in results:
-        status_val = item["_id"]
-        count = item["count"]
-        if status_val in summary:
-            summary[status_val] = count
-            summary["total"] += count
-            
-    return summary
+    return await survey_stats_service.get_counts(survey_id)
 
 @router.get("/survey/{survey_id}")
 async def list_tokens_by_survey(
@@ -93,9 +114,17 @@ async def list_tokens_by_survey(
     current_user: Annotated[User, Depends(get_current_user)],
     status: Optional[str] = None,
     batch_id: Optional[str] = None,
+    cursor: Optional[str] = None,
     page: int = 1,
-    page_size: int = 50
+    page_size: int = Query(50, ge=1, le=500),
+    include_total: bool = True
 ):
+    """
+    Lists a survey's tokens newest first. Pass the returned `next_cursor` as
+    `cursor` for constant-time keyset paging; `page` is kept for legacy
+    offset paging. `total` comes from the survey counters unless a batch
+    filter forces a count (skipped when include_total=false).
+    """
     if not ObjectId.is_valid(survey_id):
         raise HTTPException(status_code=400, detail="Invalid survey ID")
         
@@ -104,11 +133,18 @@ async def list_tokens_by_survey(
         query["status"] = status
     if batch_id:
         query["batch_id"] = batch_id
-        
-    skip = (page - 1) * page_size
+
+    tokens_col = db.get_collection("tokens")
+    if cursor:
+        tokens_cursor = tokens_col.find({**query, **keyset_filter(cursor)})
+    else:
+        tokens_cursor = tokens_col.find(query).skip((page - 1) * page_size)
     
-    tokens_cursor = db.get_collection("tokens").find(query).sort("created_at", -1).skip(skip).limit(page_size)
-    tokens_list = await tokens_cursor.to_list(page_size)
+    # Fetch one extra row to know whether another page exists
+    tokens_list = await tokens_cursor.sort(KEYSET_SORT).limit(page_size + 1).to_list(page_size + 1)
+    has_more = len(tokens_list) > page_size
+    tokens_list = tokens_list[:page_size]
+    next_cursor = encode_cursor(tokens_list[-1]) if has_more else None
     
     # Convert ObjectIds and datetimes to strings
     for t in tokens_list:
@@ -118,13 +154,20 @@ async def list_tokens_by_survey(
             if t.get(dt_field) and isinstance(t[dt_field], datetime):
                 t[dt_field] = t[dt_field].isoformat()
     
-    total = await db.get_collection("tokens").count_documents(query)
+    total = None
+    if not batch_id:
+        counts = await survey_stats_service.get_counts(survey_id)
+        total = counts.get(status, 0) if status else counts["total"]
+    elif include_total:
+        total = await tokens_col.count_documents(query)
     
     return {
         "items": tokens_list,
         "total": total,
         "page": page,
-        "page_size": page_size
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "has_more": has_more
     }
 
 @router.post("/bulk-update")
@@ -144,10 +187,24 @@ async def bulk_update_tokens(
     if not update_fields:
         raise HTTPException(status_code=400, detail="No fields provided for update")
         
-    result = await db.get_collection("tokens").update_many(
-        {"_id": {"$in": [ObjectId(tid) for tid in update_data.token_ids]}},
-        {"$set": update_fields}
-    )
+    token_filter = {"_id": {"$in": [ObjectId(tid) for tid in update_data.token_ids]}}
+    tokens_col = db.get_collection("tokens")
+
+    # Capture the current status mix so the survey counters can be moved
+    previous_counts = []
+    if update_data.status:
+        previous_counts = await tokens_col.aggregate([
+            {"$match": token_filter},
+            {"$group": {"_id": {"survey_id": "$survey_id", "status": "$status"}, "count": {"$sum": 1}}}
+        ]).to_list(None)
+
+    result = await tokens_col.update_many(token_filter, {"$set": update_fields})
+
+    if previous_counts:
+        await survey_stats_service.record_transitions({
+            (item["_id"]["survey_id"], item["_id"]["status"], update_data.status): item["count"]
+            for item in previous_counts
+        })
     
     return {
         "status": "success",
@@ -5,6 +5,7 @@ from bson import ObjectId
 from backend.database import db
 from backend.models import User, UserUpdate
 from backend.routers.auth import get_current_active_admin
+from backend.services.principal_cache import principal_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -44,6 +45,8 @@ async def update_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+
+    principal_cache.invalidate_user(user_id=user_id, username=result.get("username"))
         
     return User(**result)
 
@@ -74,5 +77,7 @@ async def delete_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+
+    principal_cache.invalidate_user(user_id=user_id)
         
     return {"detail": "User deleted"}
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException, Request
-from datetime import datetime
-from backend.database import db
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from backend.config import settings
+from backend.database import db, reads_from
 from backend.models import Response
 from backend.utils.logging_utils import logger
 from backend.services.token_service import token_service
+from backend.services.orphan_service import orphan_service
+from backend.services.webhook_ingest import webhook_ingest_queue
+from backend.services.idempotency import DUPLICATE, IN_PROGRESS, webhook_idempotency
+from backend.services.answer_cache import answer_cache
+from backend.utils import token_codec
 
-router = APIRouter(prefix="/webhook", tags=["webhook"])
+router = APIRouter(prefix="/webhook", tags=["webhook"], dependencies=[Depends(reads_from("primary"))])
 
 @router.post("/google-form")
 async def receive_google_form_response(request: Request):
@@ -13,28 +19,52 @@ async def receive_google_form_response(request: Request):
     Webhook receiver for Google Forms submissions.
     Enforces state machine: only 'passed' tokens can move to 'submitted'.
     """
+    delivery_key = None
     try:
         data = await request.json()
         token_str = data.get("token")
         answers = data.get("answers", {})
         
         logger.info(f"Webhook hit: token={token_str}")
+
+        # Apps Script retries replay the same payload: acknowledge without any writes
+        key = webhook_idempotency.key_for(data)
+        claim = await webhook_idempotency.claim(key)
+        if claim == DUPLICATE:
+            logger.info(f"Webhook duplicate ignored: token={token_str}")
+            return {"status": "duplicate"}
+        if claim == IN_PROGRESS:
+            # Not acknowledged: the first delivery may still fail and need this retry
+            raise HTTPException(
+                status_code=409,
+                detail="Delivery already in progress, retry later",
+                headers={"Retry-After": "5"}
+            )
+        # Claimed (pending): completed once the response or orphan is stored, released on a crash
+        delivery_key = key
+
+        if settings.WEBHOOK_INGEST_MODE == "queued" and webhook_ingest_queue.running:
+            return await _enqueue(data, token_str, delivery_key)
         
         if not token_str:
-            await _log_orphan(data, "missing_token")
+            await _log_orphan(data, "missing_token", delivery_key)
             raise HTTPException(status_code=400, detail="Token missing")
 
+        # Forged or mistyped tokens are rejected without a token lookup
+        if not token_codec.is_plausible(token_str):
+            await _log_orphan(data, "malformed_token", delivery_key)
+            raise HTTPException(status_code=400, detail="Malformed token")
+        token_str = token_codec.normalize(token_str)
+
         # Atomic transition: passed -> submitted
         # This implicitly checks if token exists and if status is 'passed'
+        # The post-image carries survey_id/phone for the response record
         try:
-            await token_service.update_token_status(token_str, "submitted")
+            token_doc = await token_service.transition(token_str, "submitted")
         except HTTPException as e:
-            await _log_orphan(data, f"invalid_transition_{e.detail}")
+            await _log_orphan(data, f"invalid_transition_{e.detail}", delivery_key)
             raise e
 
-        # Get token details for response record
-        token_doc = await token_service.get_token_by_string(token_str)
-        
         # Save response
         new_response = Response(
             survey_id=token_doc["survey_id"],
@@ -47,6 +77,8 @@ async def receive_google_form_response(request: Request):
         await db.get_collection("responses").insert_one(
             new_response.model_dump(by_alias=True, exclude=["id"])
         )
+        answer_cache.mark_stale(new_response.survey_id)
+        await webhook_idempotency.complete(delivery_key)
         
         logger.info(f"Webhook success: Token {token_str} finalized.")
         return {"status": "success"}
@@ -55,13 +87,29 @@ async def receive_google_form_response(request: Request):
         raise
     except Exception as e:
         logger.error(f"Webhook crash: {e}")
+        if delivery_key:
+            await webhook_idempotency.release(delivery_key)
         raise HTTPException(status_code=500, detail="Internal webhook failure")
 
-async def _log_orphan(payload: dict, reason: str):
-    """Logs submissions that don't have a valid matching token."""
-    await db.get_collection("orphan_submissions").insert_one({
-        "payload": payload,
-        "reason": reason,
-        "timestamp": datetime.utcnow()
-    })
-    logger.warning(f"Orphan submission logged: {reason}")
+async def _enqueue(data: dict, token_str: str, delivery_key: str):
+    """Queued mode: acknowledge immediately and let the ingest worker persist in batches."""
+    if not webhook_ingest_queue.submit(data):
+        logger.warning(f"Webhook ingest queue saturated, rejecting token={token_str}")
+        # Let the sender's retry through once there is room again
+        await webhook_idempotency.release(delivery_key)
+        raise HTTPException(
+            status_code=503,
+            detail="Webhook queue saturated, retry later",
+            headers={"Retry-After": "5"}
+        )
+
+    if not token_str:
+        # The worker records the orphan together with the rest of its batch and completes the claim
+        raise HTTPException(status_code=400, detail="Token missing")
+
+    return JSONResponse(status_code=202, content={"status": "accepted"})
+
+async def _log_orphan(payload: dict, reason: str, delivery_key: str):
+    """Logs submissions that don't have a valid matching token, then marks the delivery done."""
+    await orphan_service.log(payload, reason)
+    await webhook_idempotency.complete(delivery_key)
@@ -0,0 +1,251 @@
+import asyncio
+import itertools
+import math
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from backend.config import settings
+from backend.database import db
+from backend.services.demographics_service import DEMOGRAPHICS, demographics_service
+
+# Response sources that carry Layer 2 (evaluation) answers
+LAYER2_SOURCES = ["layer2", "in_app_gateway"]
+
+# Distinguishes reloads of the same survey, so derived tables know to start over
+_generations = itertools.count()
+
+# ObjectIds are minted client-side, so a response can land with an _id a little
+# older than one already loaded; each refresh re-reads this window and skips ids it has seen.
+REFRESH_OVERLAP = timedelta(seconds=60)
+FETCH_BATCH_SIZE = 5000
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, str):
+        try:
+            number = float(value.strip())
+        except ValueError:
+            return None
+        return number if math.isfinite(number) else None
+    return None
+
+
+class SurveyAnswers:
+    """
+    Columnar copy of one survey's Layer 2 answers: a float32 array per
+    question id (NaN = not answered or not numeric) and an int16 code array
+    per demographic (-1 = unknown), all indexed by response row. Buffers grow
+    by doubling so appending a refresh is amortized O(new rows). Rows are only
+    ever appended, so anything derived from rows [0, size) stays valid for the
+    same `generation`.
+    """
+
+    def __init__(self, survey_id: str):
+        self.survey_id = survey_id
+        self.generation = next(_generations)
+        self.size = 0
+        self.refreshed_at = 0.0
+        self.last_id: Optional[ObjectId] = None
+        self._recent_ids: Dict[ObjectId, None] = {}
+        self._capacity = 0
+        self._columns: Dict[str, np.ndarray] = {}
+        self._demographics: Dict[str, np.ndarray] = {dim: np.empty(0, dtype=np.int16) for dim in DEMOGRAPHICS}
+        self._codes: Dict[str, Dict[str, int]] = {dim: {} for dim in DEMOGRAPHICS}
+        self.labels: Dict[str, List[str]] = {dim: [] for dim in DEMOGRAPHICS}
+        # (survey, phone) -> demographic codes, so each phone is looked up once
+        self._phone_codes: Dict[str, Tuple[int, ...]] = {}
+
+    def _reserve(self, rows: int):
+        if rows <= self._capacity:
+            return
+        capacity = max(1024, self._capacity)
+        while capacity < rows:
+            capacity *= 2
+        for key, column in self._columns.items():
+            grown = np.full(capacity, np.nan, dtype=np.float32)
+            grown[:self.size] = column[:self.size]
+            self._columns[key] = grown
+        for dim, codes in self._demographics.items():
+            grown = np.full(capacity, -1, dtype=np.int16)
+            grown[:self.size] = codes[:self.size]
+            self._demographics[dim] = grown
+        self._capacity = capacity
+
+    def _code(self, dim: str, value: Any) -> int:
+        label = str(value).strip() if value not in (None, "") else ""
+        if not label:
+            return -1
+        codes = self._codes[dim]
+        if label not in codes:
+            if len(codes) >= np.iinfo(np.int16).max:
+                return -1  # free-text dimensions (area) beyond the code space count as unknown
+            codes[label] = len(self.labels[dim])
+            self.labels[dim].append(label)
+        return codes[label]
+
+    def unknown_phones(self, docs: List[dict]) -> List[str]:
+        return list({doc["phone"] for doc in docs if doc.get("phone") and doc["phone"] not in self._phone_codes})
+
+    def append(self, docs: List[dict], demographics_by_phone: Dict[str, dict]):
+        """
+        Adds response documents (answers, phone, _id) not seen before.
+        `demographics_by_phone` needs to cover only phones not mapped yet.
+        """
+        docs = [doc for doc in docs if doc["_id"] not in self._recent_ids]
+        if not docs:
+            return
+        self._reserve(self.size + len(docs))
+
+        # Gather per column first, then write each column with one fancy-indexed assignment
+        cells: Dict[str, Tuple[List[int], List[float]]] = {}
+        codes: Dict[str, List[int]] = {dim: [] for dim in DEMOGRAPHICS}
+        for row, doc in enumerate(docs, start=self.size):
+            for key, value in (doc.get("answers") or {}).items():
+                number = _as_number(value)
+                if number is not None:
+                    rows, numbers = cells.setdefault(key, ([], []))
+                    rows.append(row)
+                    numbers.append(number)
+            phone = doc.get("phone")
+            phone_codes = self._phone_codes.get(phone)
+            if phone_codes is None:
+                demographics = demographics_by_phone.get(phone) or {}
+                phone_codes = tuple(self._code(dim, demographics.get(dim)) for dim in DEMOGRAPHICS)
+                if phone:
+                    self._phone_codes[phone] = phone_codes
+            for dim, code in zip(DEMOGRAPHICS, phone_codes):
+                codes[dim].append(code)
+
+        for key, (rows, numbers) in cells.items():
+            column = self._columns.get(key)
+            if column is None:
+                column = self._columns[key] = np.full(self._capacity, np.nan, dtype=np.float32)
+            column[rows] = numbers
+        for dim in DEMOGRAPHICS:
+            self._demographics[dim][self.size:self.size + len(docs)] = codes[dim]
+        self.size += len(docs)
+
+        # Docs arrive in _id order, so the oldest remembered ids are at the front
+        for doc in docs:
+            self._recent_ids[doc["_id"]] = None
+        self.last_id = max(self.last_id or docs[-1]["_id"], docs[-1]["_id"])
+        horizon = self.last_id.generation_time - REFRESH_OVERLAP
+        while self._recent_ids:
+            oldest = next(iter(self._recent_ids))
+            if oldest.generation_time >= horizon:
+                break
+            del self._recent_ids[oldest]
+
+    def question_ids(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, question_id: str) -> Optional[np.ndarray]:
+        column = self._columns.get(question_id)
+        return None if column is None else column[:self.size]
+
+    def demographic(self, dim: str) -> np.ndarray:
+        return self._demographics[dim][:self.size]
+
+
+def summarize(values: np.ndarray, scale_max: int = 5, top_boxes: int = 1) -> Dict[str, Any]:
+    """Answer count, mean, top-box share and value histogram of one question column."""
+    answered = values[~np.isnan(values)]
+    if not answered.size:
+        return {"n": 0, "mean": None, "top_box": None, "histogram": {}}
+    levels, counts = np.unique(answered, return_counts=True)
+    return {
+        "n": int(answered.size),
+        "mean": round(float(answered.mean()), 4),
+        "top_box": round(float((answered >= scale_max - top_boxes + 1).mean()), 4),
+        "histogram": {level_label(level): int(count) for level, count in zip(levels, counts)}
+    }
+
+
+def level_label(level: float) -> str:
+    return str(int(level)) if float(level).is_integer() else str(float(level))
+
+
+class AnswerCache:
+    """
+    Per-process LRU of SurveyAnswers. Reads refresh a survey at most every
+    ANSWER_CACHE_REFRESH_SECONDS by loading only responses newer than the
+    ones already held; mark_stale() forces the next read to refresh.
+    """
+
+    def __init__(self, max_surveys: int, refresh_seconds: float):
+        self.max_surveys = max_surveys
+        self.refresh_seconds = refresh_seconds
+        self._entries: "OrderedDict[str, SurveyAnswers]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.refreshes = 0
+
+    async def get(self, survey_id: str) -> SurveyAnswers:
+        entry = self._entries.get(survey_id)
+        if entry is None:
+            entry = self._entries[survey_id] = SurveyAnswers(survey_id)
+            while len(self._entries) > max(self.max_surveys, 1):
+                evicted, _ = self._entries.popitem(last=False)
+                self._locks.pop(evicted, None)
+        self._entries.move_to_end(survey_id)
+
+        if time.monotonic() - entry.refreshed_at >= self.refresh_seconds:
+            lock = self._locks.setdefault(survey_id, asyncio.Lock())
+            async with lock:
+                if time.monotonic() - entry.refreshed_at >= self.refresh_seconds:
+                    await self._refresh(entry)
+        return entry
+
+    async def _refresh(self, entry: SurveyAnswers):
+        # Always from the primary: a lagging secondary could hide responses older
+        # than REFRESH_OVERLAP, and phones mapped without demographics stay unknown
+        with db.reads("primary"):
+            await self._load(entry)
+        entry.refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    async def _load(self, entry: SurveyAnswers):
+        query = {"survey_id": entry.survey_id, "source": {"$in": LAYER2_SOURCES}}
+        if entry.last_id is not None:
+            query["_id"] = {"$gte": ObjectId.from_datetime(entry.last_id.generation_time - REFRESH_OVERLAP)}
+        cursor = db.get_collection("responses").find(
+            query, {"answers": 1, "phone": 1}, batch_size=FETCH_BATCH_SIZE
+        ).sort("_id", 1)
+
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= FETCH_BATCH_SIZE:
+                entry.append(batch, await demographics_service.lookup(entry.survey_id, entry.unknown_phones(batch)))
+                batch = []
+        if batch:
+            entry.append(batch, await demographics_service.lookup(entry.survey_id, entry.unknown_phones(batch)))
+
+    def mark_stale(self, survey_id: str):
+        entry = self._entries.get(str(survey_id))
+        if entry is not None:
+            entry.refreshed_at = 0.0
+
+    def invalidate(self, survey_id: str):
+        self._entries.pop(str(survey_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "surveys": len(self._entries),
+            "rows": sum(entry.size for entry in self._entries.values()),
+            "refreshes": self.refreshes,
+        }
+
+
+answer_cache = AnswerCache(
+    max_surveys=settings.ANSWER_CACHE_MAX_SURVEYS,
+    refresh_seconds=settings.ANSWER_CACHE_REFRESH_SECONDS,
+)
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from backend.config import settings
+from backend.services.answer_cache import SurveyAnswers, answer_cache, level_label
+
+UNKNOWN_LABEL = "unknown"
+
+TableKey = Tuple[str, str, str]  # (survey_id, question_id, dimension)
+
+
+class _Table:
+    """
+    Contingency counts of one question against one demographic: rows are
+    demographic groups (0 = unknown), columns the distinct answer values.
+    Only response rows past `rows` are counted on each update.
+    """
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.rows = 0
+        self.levels = np.empty(0, dtype=np.float32)
+        self.counts = np.zeros((1, 0), dtype=np.int64)
+        self.results: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+    def update(self, values: np.ndarray, codes: np.ndarray, group_count: int):
+        new_values, new_groups = values[self.rows:], codes[self.rows:].astype(np.int64) + 1
+        self.rows = len(values)
+        self.results.clear()
+
+        answered = ~np.isnan(new_values)
+        new_values, new_groups = new_values[answered], new_groups[answered]
+        levels = np.union1d(self.levels, new_values)
+
+        # Re-home the existing counts when new answer values or groups appeared
+        counts = np.zeros((group_count, len(levels)), dtype=np.int64)
+        counts[:self.counts.shape[0], np.searchsorted(levels, self.levels)] = self.counts
+        counts += np.bincount(
+            new_groups * len(levels) + np.searchsorted(levels, new_values),
+            minlength=group_count * len(levels)
+        ).reshape(group_count, len(levels))
+        self.levels, self.counts = levels, counts
+
+    def result(self, labels, scale_max: int, top_boxes: int) -> Dict[str, Any]:
+        n = self.counts.sum(axis=1)
+        sums = self.counts @ self.levels.astype(np.float64)
+        top = self.counts[:, self.levels >= scale_max - top_boxes + 1].sum(axis=1)
+        level_labels = [level_label(level) for level in self.levels]
+
+        groups = []
+        for group, label in enumerate([UNKNOWN_LABEL] + list(labels)):
+            if not n[group]:
+                continue
+            groups.append({
+                "group": label,
+                "n": int(n[group]),
+                "mean": round(float(sums[group] / n[group]), 4),
+                "top_box": round(float(top[group] / n[group]), 4),
+                "histogram": dict(zip(level_labels, self.counts[group].tolist()))
+            })
+        return {"responses": self.rows, "levels": level_labels, "groups": groups}
+
+
+class CrossTabEngine:
+    """
+    Incremental cross-tabs of any Layer 2 question against any demographic,
+    built on the columnar answer cache. Each (survey, question, dimension)
+    table only counts responses added since its last update, and its
+    formatted results are reused until the survey gets new responses.
+    """
+
+    def __init__(self, max_tables: int):
+        self.max_tables = max_tables
+        self._tables: "OrderedDict[TableKey, _Table]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _table(self, key: TableKey, answers: SurveyAnswers) -> _Table:
+        table = self._tables.get(key)
+        if table is None or table.generation != answers.generation:
+            table = self._tables[key] = _Table(answers.generation)
+            while len(self._tables) > max(self.max_tables, 1):
+                self._tables.popitem(last=False)
+        self._tables.move_to_end(key)
+        return table
+
+    async def crosstab(self, survey_id: str, question_id: str, dimension: str, scale_max: int = 5, top_boxes: int = 1) -> Optional[Dict[str, Any]]:
+        """Returns the cross-tab, or None when the question has no numeric answers."""
+        answers = await answer_cache.get(survey_id)
+        values = answers.column(question_id)
+        if values is None:
+            return None
+
+        table = self._table((survey_id, question_id, dimension), answers)
+        if table.rows != answers.size:
+            table.update(values, answers.demographic(dimension), len(answers.labels[dimension]) + 1)
+
+        result = table.results.get((scale_max, top_boxes))
+        if result is None:
+            self.misses += 1
+            result = table.results[(scale_max, top_boxes)] = table.result(answers.labels[dimension], scale_max, top_boxes)
+        else:
+            self.hits += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tables": len(self._tables),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+crosstab_engine = CrossTabEngine(max_tables=settings.CROSSTAB_MAX_TABLES)
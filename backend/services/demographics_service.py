@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Dict, Iterable
+
+from backend.database import db
+
+DEMOGRAPHICS = ("gender", "age_range", "area")
+
+
+class DemographicsService:
+    """
+    Denormalized respondent demographics per survey in `survey_demographics`
+    ({_id: "survey_id|phone", survey_id, phone, gender, age_range, area}),
+    written when Layer 1 is submitted so breakdowns never need a $lookup
+    into `respondents`.
+    """
+
+    @staticmethod
+    def _col():
+        return db.get_collection("survey_demographics")
+
+    @staticmethod
+    def _key(survey_id: str, phone: str) -> str:
+        return f"{survey_id}|{phone}"
+
+    @staticmethod
+    async def record(survey_id: str, phone: str, demographics: dict):
+        values = {dim: demographics[dim] for dim in DEMOGRAPHICS if demographics.get(dim)}
+        if not phone or not values:
+            return
+        await DemographicsService._col().update_one(
+            {"_id": DemographicsService._key(survey_id, phone)},
+            {
+                "$set": {**values, "updated_at": datetime.utcnow()},
+                "$setOnInsert": {"survey_id": survey_id, "phone": phone}
+            },
+            upsert=True
+        )
+
+    @staticmethod
+    async def lookup(survey_id: str, phones: Iterable[str]) -> Dict[str, dict]:
+        """
+        Returns {phone: {dimension: value}}. Phones with no survey record
+        (responses from before this collection existed) fall back to their
+        latest `respondents` profile.
+        """
+        phones = [p for p in set(phones) if p]
+        if not phones:
+            return {}
+        projection = {"phone": 1, **{dim: 1 for dim in DEMOGRAPHICS}}
+        found = {
+            doc["phone"]: doc
+            async for doc in DemographicsService._col().find(
+                {"_id": {"$in": [DemographicsService._key(survey_id, p) for p in phones]}}, projection
+            )
+        }
+        missing = [p for p in phones if p not in found]
+        if missing:
+            async for doc in db.get_collection("respondents").find({"phone": {"$in": missing}}, projection):
+                found[doc["phone"]] = doc
+        return found
+
+
+demographics_service = DemographicsService()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List
+
+from pymongo.errors import DuplicateKeyError
+
+from backend.config import settings
+from backend.database import db
+
+# Outcomes of WebhookIdempotency.claim()
+CLAIMED = "claimed"
+DUPLICATE = "duplicate"
+IN_PROGRESS = "in_progress"
+
+
+class WebhookIdempotency:
+    """
+    Deduplicates webhook deliveries by a key derived from the token and a hash
+    of the answers. Keys live in the TTL-indexed `webhook_deliveries`
+    collection: a claim starts "pending" and only becomes "done" once the
+    response or orphan record is persisted, so a delivery lost to a crash is
+    retried. A pending claim older than WEBHOOK_IDEMPOTENCY_PENDING_TIMEOUT_SECONDS
+    can be taken over by a retry. A bounded in-memory set of recently
+    completed keys short-circuits retries that hit the same worker without
+    touching MongoDB.
+    """
+
+    def __init__(self, recent_size: int, pending_timeout_seconds: int):
+        self.recent_size = recent_size
+        self.pending_timeout = timedelta(seconds=pending_timeout_seconds)
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self.duplicates = 0
+        self.takeovers = 0
+
+    @staticmethod
+    def key_for(payload: dict) -> str:
+        answers = json.dumps(payload.get("answers", {}), sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha256(answers.encode("utf-8")).hexdigest()
+        return f"{payload.get('token') or ''}:{digest}"
+
+    def _remember(self, key: str):
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+
+    async def claim(self, key: str) -> str:
+        """
+        CLAIMED for the first delivery of `key` (or a retry of one whose claim
+        went stale), DUPLICATE once it is done, IN_PROGRESS while another
+        delivery of it is still being processed.
+        """
+        if key in self._recent:
+            self.duplicates += 1
+            return DUPLICATE
+        deliveries = db.get_collection("webhook_deliveries")
+        now = datetime.utcnow()
+        try:
+            await deliveries.insert_one({"_id": key, "state": "pending", "created_at": now})
+            return CLAIMED
+        except DuplicateKeyError:
+            pass
+
+        taken = await deliveries.find_one_and_update(
+            {"_id": key, "state": "pending", "created_at": {"$lt": now - self.pending_timeout}},
+            {"$set": {"created_at": now}}
+        )
+        if taken is not None:
+            self.takeovers += 1
+            return CLAIMED
+
+        existing = await deliveries.find_one({"_id": key}, {"state": 1})
+        if existing is None or existing.get("state") == "pending":
+            # Released or expired in between counts as in progress too: the sender retries
+            return IN_PROGRESS
+        # Keys recorded before claims had a state are all done
+        self._remember(key)
+        self.duplicates += 1
+        return DUPLICATE
+
+    async def complete(self, key: str):
+        """Marks a claimed key done once its response or orphan record is persisted."""
+        await self.complete_many([key])
+
+    async def complete_many(self, keys: List[str]):
+        if not keys:
+            return
+        await db.get_collection("webhook_deliveries").update_many(
+            {"_id": {"$in": keys}},
+            {"$set": {"state": "done"}}
+        )
+        for key in keys:
+            self._remember(key)
+
+    async def release(self, key: str):
+        """Forgets a claimed key so a retry is processed again (used when processing crashed)."""
+        self._recent.pop(key, None)
+        await db.get_collection("webhook_deliveries").delete_one({"_id": key})
+
+
+webhook_idempotency = WebhookIdempotency(
+    recent_size=settings.WEBHOOK_IDEMPOTENCY_CACHE_SIZE,
+    pending_timeout_seconds=settings.WEBHOOK_IDEMPOTENCY_PENDING_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,137 @@
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from backend.config import settings
+from backend.database import db
+from backend.utils.logging_utils import logger
+
+
+# Reasons whose record is the only copy of a submission the sender was told
+# was accepted. They keep their full payload and are exempt from the TTL.
+INGEST_FAILURE_REASON = "ingest_failure"
+CONCURRENT_UPDATE_REASON = "invalid_transition_State transition failed due to concurrent update"
+RECOVERABLE_REASONS = frozenset({INGEST_FAILURE_REASON, CONCURRENT_UPDATE_REASON})
+
+
+def minute_bucket(at: datetime) -> datetime:
+    return at.replace(second=0, microsecond=0)
+
+
+class OrphanService:
+    """
+    Records webhook submissions that don't have a valid matching token.
+    Raw records in `orphan_submissions` keep at most ORPHAN_PAYLOAD_MAX_BYTES
+    of payload and expire after ORPHAN_RETENTION_DAYS (partial TTL index),
+    except RECOVERABLE_REASONS, which are kept whole until replayed. Every
+    record also bumps a per-reason, per-minute counter in `orphan_counters`,
+    which is what the orphan dashboards aggregate.
+    """
+
+    @staticmethod
+    def trim_payload(payload: Any) -> Any:
+        """Returns the payload, or a truncated preview of it if its JSON form is too large."""
+        encoded = json.dumps(payload, ensure_ascii=False, default=str)
+        limit = settings.ORPHAN_PAYLOAD_MAX_BYTES
+        if len(encoded.encode("utf-8")) <= limit:
+            return payload
+        preview = {
+            "_truncated": True,
+            "original_bytes": len(encoded.encode("utf-8")),
+            "preview": encoded.encode("utf-8")[:limit].decode("utf-8", errors="ignore")
+        }
+        if isinstance(payload, dict):
+            # Keep what is needed to trace the submission back
+            preview["token"] = payload.get("token")
+            answers = payload.get("answers")
+            if isinstance(answers, dict):
+                preview["answer_keys"] = list(answers)[:100]
+        return preview
+
+    @staticmethod
+    def build_document(payload: dict, reason: str, now: Optional[datetime] = None) -> dict:
+        recoverable = reason in RECOVERABLE_REASONS
+        return {
+            "payload": payload if recoverable else OrphanService.trim_payload(payload),
+            "reason": reason,
+            "recoverable": recoverable,
+            "timestamp": now or datetime.utcnow()
+        }
+
+    @staticmethod
+    def _counter_updates(documents: List[dict]) -> List[UpdateOne]:
+        counts: Dict[Tuple[str, datetime], int] = defaultdict(int)
+        latest: Dict[Tuple[str, datetime], datetime] = {}
+        for doc in documents:
+            key = (doc["reason"], minute_bucket(doc["timestamp"]))
+            counts[key] += 1
+            latest[key] = max(latest.get(key, doc["timestamp"]), doc["timestamp"])
+        return [
+            UpdateOne(
+                {"_id": f"{reason}|{minute.isoformat()}"},
+                {
+                    "$inc": {"count": count},
+                    "$max": {"latest": latest[(reason, minute)]},
+                    "$setOnInsert": {"reason": reason, "minute": minute}
+                },
+                upsert=True
+            )
+            for (reason, minute), count in counts.items()
+        ]
+
+    @staticmethod
+    async def _store(documents: List[dict]):
+        await asyncio.gather(
+            db.get_collection("orphan_submissions").insert_many(documents, ordered=False),
+            db.get_collection("orphan_counters").bulk_write(OrphanService._counter_updates(documents), ordered=False)
+        )
+
+    @staticmethod
+    async def log(payload: dict, reason: str):
+        await OrphanService._store([OrphanService.build_document(payload, reason)])
+        logger.warning(f"Orphan submission logged: {reason}")
+
+    @staticmethod
+    async def log_many(orphans: List[Tuple[dict, str]]):
+        """Logs (payload, reason) pairs with a single insert_many and one counter bulk_write."""
+        if not orphans:
+            return
+        now = datetime.utcnow()
+        await OrphanService._store([OrphanService.build_document(payload, reason, now) for payload, reason in orphans])
+        logger.warning(f"Orphan submissions logged: {len(orphans)}")
+
+    @staticmethod
+    async def summary(since: Optional[datetime] = None) -> List[dict]:
+        """[{_id: reason, count, latest_attempt}] from the minute counters, most frequent first."""
+        match = {"minute": {"$gte": minute_bucket(since)}} if since else {}
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$reason", "count": {"$sum": "$count"}, "latest_attempt": {"$max": "$latest"}}},
+            {"$sort": {"count": -1}}
+        ]
+        return await db.get_collection("orphan_counters").aggregate(pipeline).to_list(None)
+
+    @staticmethod
+    async def timeline(since: datetime, reason: Optional[str] = None, granularity: str = "minute") -> List[dict]:
+        """Orphan counts per minute (or hour) and reason since `since`, oldest first."""
+        match: Dict[str, Any] = {"minute": {"$gte": minute_bucket(since)}}
+        if reason:
+            match["reason"] = reason
+        bucket = "$minute" if granularity == "minute" else {"$dateTrunc": {"date": "$minute", "unit": "hour"}}
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": {"bucket": bucket, "reason": "$reason"}, "count": {"$sum": "$count"}}},
+            {"$sort": {"_id.bucket": 1}}
+        ]
+        rows = await db.get_collection("orphan_counters").aggregate(pipeline).to_list(None)
+        return [
+            {"bucket": row["_id"]["bucket"].isoformat(), "reason": row["_id"]["reason"], "count": row["count"]}
+            for row in rows
+        ]
+
+
+orphan_service = OrphanService()
@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from backend.config import settings
+from backend.models import User
+
+PrincipalKey = Tuple[str, str]  # (username, token id: jti, or iat/exp for older tokens)
+
+
+class PrincipalCache:
+    """
+    Short-TTL per-process cache of authenticated users keyed by
+    (username, token id), so get_current_user can skip the users lookup.
+
+    invalidate_user() only reaches the worker that handled the admin change.
+    Every other worker (gunicorn runs several) keeps serving its cached
+    copy, so a deactivated user or a role change takes effect there for up to
+    PRINCIPAL_CACHE_TTL_SECONDS. Keep the TTL short; 0 disables the cache.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[PrincipalKey, Tuple[float, User]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: PrincipalKey) -> Optional[User]:
+        item = self._entries.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: PrincipalKey, user: User):
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: Optional[str] = None, username: Optional[str] = None):
+        """Drops every cached session of a user in this process, matched by id or username."""
+        stale = [
+            key for key, (_, user) in self._entries.items()
+            if (user_id and str(user.id) == str(user_id)) or (username and key[0] == username)
+        ]
+        for key in stale:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
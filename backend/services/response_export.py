@@ -0,0 +1,203 @@
+import asyncio
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from backend.config import settings
+from backend.database import db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for Parquet exports
+    pa = pq = None
+
+META_COLUMNS = ["response_id", "token", "phone", "source", "submitted_at"]
+EXTRA_COLUMN = "extra_answers"  # JSON of answers whose key is not a snapshot question id
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def answer_columns(payload: Dict[str, Any]) -> List[str]:
+    """Question ids of the survey's Layer 1 and Layer 2 snapshot, in display order."""
+    questions = list(payload.get("questions") or [])
+    layer2 = payload.get("layer2_questions") or {}
+    if isinstance(layer2, dict):
+        for section in layer2.get("sections") or []:
+            if isinstance(section, dict):
+                questions.extend(section.get("questions") or [])
+
+    columns = []
+    for q in questions:
+        q_id = q.get("id") if isinstance(q, dict) else None
+        if q_id and str(q_id) not in columns:
+            columns.append(str(q_id))
+    return columns
+
+
+def _text(value: Any) -> Optional[str]:
+    """Cell value as text; lists and dicts (multi-select, grids) become JSON."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+class _ByteSink:
+    """Write-only file for ParquetWriter whose bytes are drained after each row group."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ResponseExportService:
+    """
+    Streams a survey's responses from a server-side cursor, one row per
+    response with `answers` flattened into one column per snapshot question
+    id. Only one cursor batch (or Parquet row group) is held in memory.
+    """
+
+    @staticmethod
+    def columns(question_ids: List[str]) -> List[str]:
+        # Question ids that clash with a metadata column are prefixed
+        reserved = set(META_COLUMNS) | {EXTRA_COLUMN}
+        answer_headers = [f"answers.{q}" if q in reserved else q for q in question_ids]
+        return META_COLUMNS + answer_headers + [EXTRA_COLUMN]
+
+    @staticmethod
+    async def batches(survey_id: str, question_ids: List[str], source: Optional[str] = None, size: Optional[int] = None) -> AsyncIterator[List[List[Any]]]:
+        """Yields lists of rows (in `columns` order), oldest response first."""
+        size = size or settings.RESPONSE_EXPORT_BATCH_SIZE
+        query = {"survey_id": survey_id}
+        if source:
+            query["source"] = source
+        cursor = db.get_collection("responses").find(
+            query, batch_size=settings.RESPONSE_EXPORT_BATCH_SIZE
+        ).sort("_id", 1)
+
+        known = set(question_ids)
+        chunk = []
+        async for doc in cursor:
+            answers = doc.get("answers") or {}
+            extra = {k: v for k, v in answers.items() if k not in known}
+            chunk.append(
+                [str(doc["_id"]), doc.get("token"), doc.get("phone"), doc.get("source"), doc.get("submitted_at")]
+                + [answers.get(q) for q in question_ids]
+                + [extra or None]
+            )
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    async def csv_stream(columns: List[str], batches: AsyncIterator[List[List[Any]]]) -> AsyncIterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        async for chunk in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([["" if (cell := _text(v)) is None else cell for v in row] for row in chunk])
+            yield buffer.getvalue()
+
+    @staticmethod
+    async def ndjson_stream(columns: List[str], batches: AsyncIterator[List[List[Any]]]) -> AsyncIterator[str]:
+        async for chunk in batches:
+            yield "".join(
+                json.dumps(
+                    {col: (v.isoformat() if isinstance(v, datetime) else v) for col, v in zip(columns, row)},
+                    ensure_ascii=False, default=str
+                ) + "\n"
+                for row in chunk
+            )
+
+    @staticmethod
+    async def parquet_stream(columns: List[str], batches: AsyncIterator[List[List[Any]]], compression: str) -> AsyncIterator[bytes]:
+        """One Parquet row group per batch; answers are stored as text like the CSV export."""
+        fields = [
+            pa.field(col, pa.timestamp("ms") if col == "submitted_at" else pa.string())
+            for col in columns
+        ]
+        schema = pa.schema(fields)
+        sink = _ByteSink()
+        writer = pq.ParquetWriter(sink, schema, compression=compression)
+        try:
+            async for chunk in batches:
+                arrays = [
+                    pa.array(
+                        [row[i] for row in chunk] if field.name == "submitted_at" else [_text(row[i]) for row in chunk],
+                        type=field.type
+                    )
+                    for i, field in enumerate(fields)
+                ]
+                table = pa.Table.from_arrays(arrays, schema=schema)
+                await asyncio.to_thread(writer.write_table, table)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    @staticmethod
+    async def gzip_stream(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+        compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+        async for chunk in chunks:
+            data = compressor.compress(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    def stream(survey_id: str, question_ids: List[str], fmt: str, gzip: bool = False, source: Optional[str] = None) -> AsyncIterator:
+        """Returns the byte/str stream for `fmt`. Parquet uses gzip as its column codec instead of wrapping the file."""
+        columns = ResponseExportService.columns(question_ids)
+        if fmt == "parquet":
+            if pa is None:
+                raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+            batches = ResponseExportService.batches(survey_id, question_ids, source, size=settings.RESPONSE_EXPORT_ROW_GROUP_SIZE)
+            return ResponseExportService.parquet_stream(columns, batches, "gzip" if gzip else "snappy")
+
+        batches = ResponseExportService.batches(survey_id, question_ids, source)
+        text = (ResponseExportService.csv_stream if fmt == "csv" else ResponseExportService.ndjson_stream)(columns, batches)
+        return ResponseExportService.gzip_stream(text) if gzip else text
+
+
+response_export_service = ResponseExportService()
@@ -0,0 +1,179 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from pymongo import ReplaceOne, UpdateOne
+
+from backend.database import db
+from backend.utils.logging_utils import logger
+
+# Event = (survey_id, status, occurred_at) -> count; "created" counts new tokens
+RollupEvents = Dict[Tuple[str, str, datetime], int]
+
+UTC_NAMES = {"UTC", "Etc/UTC", "GMT", "Etc/GMT"}
+
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    bucket = at.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        bucket = bucket.replace(hour=0)
+    return bucket
+
+
+class RollupService:
+    """
+    Hourly and daily (UTC) per-survey status counts in `survey_rollups`, keyed
+    by the time the status change happened. Counters are $inc'ed as
+    transitions occur, so the current bucket is always up to date; history
+    from before rollups existed is filled in once with backfill().
+    Daily buckets serve UTC day queries; other time zones are regrouped from
+    hourly buckets (exact for whole-hour UTC offsets).
+    """
+
+    @staticmethod
+    def _col():
+        return db.get_collection("survey_rollups")
+
+    @staticmethod
+    def _updates(events: RollupEvents) -> List[UpdateOne]:
+        increments: Dict[Tuple[str, str, datetime], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for (survey_id, status, occurred_at), count in events.items():
+            if not count:
+                continue
+            for granularity in ("hour", "day"):
+                key = (survey_id, granularity, bucket_start(occurred_at, granularity))
+                increments[key][f"counts.{status}"] += count
+
+        return [
+            UpdateOne(
+                {"_id": f"{survey_id}|{granularity}|{bucket.isoformat()}"},
+                {
+                    "$inc": dict(inc),
+                    "$setOnInsert": {"survey_id": survey_id, "granularity": granularity, "bucket": bucket}
+                },
+                upsert=True
+            )
+            for (survey_id, granularity, bucket), inc in increments.items()
+        ]
+
+    @staticmethod
+    async def record(events: RollupEvents):
+        updates = RollupService._updates(events)
+        if updates:
+            await RollupService._col().bulk_write(updates, ordered=False)
+
+    @staticmethod
+    async def _live_starts(match: dict) -> Dict[str, datetime]:
+        """Earliest hourly bucket each survey has recorded (not backfilled) counts in."""
+        pipeline = [
+            {"$match": {**match, "granularity": "hour", "backfilled": {"$ne": True}}},
+            {"$group": {"_id": "$survey_id", "first": {"$min": "$bucket"}}}
+        ]
+        return {item["_id"]: item["first"] async for item in RollupService._col().aggregate(pipeline)}
+
+    @staticmethod
+    async def backfill(survey_id: Optional[str] = None) -> int:
+        """
+        Fills in the buckets from before a survey's rollups were recorded, from
+        `tokens`: status changes are bucketed by last_accessed and token creation
+        by created_at. A token's current status is all that is stored, so a
+        submitted token also counts as passed (in its submission hour).
+
+        Only hours before the survey's first recorded bucket (or before the
+        current hour, if it has none) and days before that hour's day are
+        written, so buckets that transitions $inc are never touched. Backfilled
+        buckets are replaced whole and flagged, which makes reruns idempotent.
+        Returns buckets written.
+        """
+        match = {"survey_id": survey_id} if survey_id else {}
+        live_starts = await RollupService._live_starts(match)
+        current_hour = bucket_start(datetime.utcnow(), "hour")
+        hour_expr = lambda field: {"$dateTrunc": {"date": f"${field}", "unit": "hour"}}
+
+        status_pipeline = [
+            {"$match": {**match, "status": {"$ne": "unused"}, "last_accessed": {"$type": "date"}}},
+            {"$group": {"_id": {"survey_id": "$survey_id", "status": "$status", "hour": hour_expr("last_accessed")}, "count": {"$sum": 1}}}
+        ]
+        created_pipeline = [
+            {"$match": {**match, "created_at": {"$type": "date"}}},
+            {"$group": {"_id": {"survey_id": "$survey_id", "status": "created", "hour": hour_expr("created_at")}, "count": {"$sum": 1}}}
+        ]
+        buckets: Dict[Tuple[str, str, datetime], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        tokens_col = db.get_collection("tokens")
+        for pipeline in (status_pipeline, created_pipeline):
+            async for item in tokens_col.aggregate(pipeline, allowDiskUse=True):
+                key = item["_id"]
+                cutoff = live_starts.get(key["survey_id"], current_hour)
+                statuses = ["passed", "submitted"] if key["status"] == "submitted" else [key["status"]]
+                for granularity in ("hour", "day"):
+                    bucket = bucket_start(key["hour"], granularity)
+                    if bucket >= bucket_start(cutoff, granularity):
+                        continue
+                    for status in statuses:
+                        buckets[(key["survey_id"], granularity, bucket)][status] += item["count"]
+
+        written: Dict[str, List[str]] = defaultdict(list)
+        updates = []
+        for (bucket_survey, granularity, bucket), counts in buckets.items():
+            bucket_id = f"{bucket_survey}|{granularity}|{bucket.isoformat()}"
+            written[bucket_survey].append(bucket_id)
+            updates.append(ReplaceOne(
+                {"_id": bucket_id},
+                {"survey_id": bucket_survey, "granularity": granularity, "bucket": bucket, "counts": dict(counts), "backfilled": True},
+                upsert=True
+            ))
+        if updates:
+            await RollupService._col().bulk_write(updates, ordered=False)
+        # Earlier backfills whose tokens have since moved on
+        previously_backfilled = await RollupService._col().distinct("survey_id", {**match, "backfilled": True})
+        for bucket_survey in set(written) | set(previously_backfilled):
+            await RollupService._col().delete_many(
+                {"survey_id": bucket_survey, "backfilled": True, "_id": {"$nin": written[bucket_survey]}}
+            )
+        logger.info(f"Backfilled {len(updates)} rollup bucket(s)")
+        return len(updates)
+
+    @staticmethod
+    async def series(survey_id: str, start: datetime, end: datetime, tz: ZoneInfo, granularity: str) -> List[dict]:
+        """
+        Status counts per local day/hour in [start, end) (naive UTC datetimes),
+        as [{"_id": label, "<status>": n, ...}] sorted by label.
+        """
+        use_daily = granularity == "day" and getattr(tz, "key", "UTC") in UTC_NAMES
+        source = "day" if use_daily else "hour"
+        label_format = "%Y-%m-%d" if granularity == "day" else "%Y-%m-%d %H:00"
+
+        cursor = RollupService._col().find(
+            {
+                "survey_id": survey_id,
+                "granularity": source,
+                "bucket": {"$gte": bucket_start(start, source), "$lt": end}
+            },
+            {"bucket": 1, "counts": 1}
+        ).sort("bucket", 1)
+
+        series: Dict[str, Dict[str, int]] = {}
+        async for doc in cursor:
+            local = doc["bucket"].replace(tzinfo=timezone.utc).astimezone(tz)
+            label = local.strftime(label_format)
+            point = series.setdefault(label, defaultdict(int))
+            for status, count in doc.get("counts", {}).items():
+                point[status] += count
+
+        return [{"_id": label, **counts} for label, counts in series.items()]
+
+
+def range_for(days: int, start: Optional[datetime], end: Optional[datetime], tz: ZoneInfo) -> Tuple[datetime, datetime]:
+    """Resolves query bounds to naive UTC; naive inputs are read as local time in `tz`."""
+    def to_utc(value: datetime) -> datetime:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=tz)
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    end_utc = to_utc(end) if end else datetime.utcnow()
+    start_utc = to_utc(start) if start else end_utc - timedelta(days=days)
+    return start_utc, end_utc
+
+
+rollup_service = RollupService()
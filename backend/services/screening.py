@@ -0,0 +1,181 @@
+import re
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from backend.models import Layer1Rules
+from backend.utils.logging_utils import logger
+
+# Answer keys the gateway and legacy clients use for the demographic questions
+GENDER_KEYS = ("gender", "gender_auto", "Gender")
+AGE_KEYS = ("age_auto", "Age Range", "age")
+
+# Rule values that mean "no restriction"
+_ANY_VALUES = {"", "any", "all", "both"}
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+class ScreeningCheck(NamedTuple):
+    question_ids: Tuple[str, ...]  # answer keys, the first one present is used
+    predicate: Callable[[Any], bool]
+    expected: Any
+
+
+class ScreeningRuleSet:
+    """
+    Flat, pre-ordered list of Layer 1 checks compiled once per survey.
+    Evaluation stops at the first failing check.
+    """
+
+    def __init__(self, checks: Iterable[ScreeningCheck]):
+        self.checks = tuple(checks)
+
+    def __len__(self) -> int:
+        return len(self.checks)
+
+    def evaluate(self, answers: Dict[str, Any]) -> Tuple[bool, str]:
+        for check in self.checks:
+            value = _lookup(answers, check.question_ids)
+            if not check.predicate(value):
+                return False, f"Question {check.question_ids[0]}: expected '{check.expected}', got '{value}'"
+        return True, ""
+
+    def evaluate_many(self, answer_sets: Iterable[Dict[str, Any]]) -> List[Tuple[bool, str]]:
+        return [self.evaluate(answers) for answers in answer_sets]
+
+
+def _lookup(answers: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    for key in keys:
+        value = answers.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def _parse_age_bounds(value: Any) -> Optional[Tuple[float, float]]:
+    """Parses an age answer ("25", 25, "19-25", "60+") into an inclusive range."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value), float(value)
+    if not isinstance(value, str):
+        return None
+
+    numbers = [float(n) for n in _NUMBER_RE.findall(value)]
+    if not numbers:
+        return None
+    if len(numbers) == 1:
+        if value.strip().endswith("+"):
+            return numbers[0], float("inf")
+        return numbers[0], numbers[0]
+    return min(numbers[0], numbers[1]), max(numbers[0], numbers[1])
+
+
+def _to_number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _equals(expected: Any) -> Callable[[Any], bool]:
+    return lambda value: value == expected
+
+
+def _gender_matches(expected: str) -> Callable[[Any], bool]:
+    expected = expected.strip().casefold()
+    return lambda value: isinstance(value, str) and value.strip().casefold() == expected
+
+
+def _age_within(age_min: Optional[int], age_max: Optional[int]) -> Callable[[Any], bool]:
+    low = float(age_min) if age_min is not None else float("-inf")
+    high = float(age_max) if age_max is not None else float("inf")
+
+    def predicate(value: Any) -> bool:
+        # A range answer ("25-34") passes if any age in it is allowed; a single age is compared as is
+        bounds = _parse_age_bounds(value)
+        return bounds is not None and bounds[0] <= high and bounds[1] >= low
+
+    return predicate
+
+
+def _compare(op: Callable[[float, float], bool], expected: Any) -> Callable[[Any], bool]:
+    expected_num = _to_number(expected)
+
+    def predicate(value: Any) -> bool:
+        value_num = _to_number(value)
+        return value_num is not None and expected_num is not None and op(value_num, expected_num)
+
+    return predicate
+
+
+def _as_list(expected: Any) -> list:
+    return expected if isinstance(expected, list) else [expected]
+
+
+CONDITION_OPERATORS: Dict[str, Callable[[Any], Callable[[Any], bool]]] = {
+    "eq": _equals,
+    "ne": lambda expected: lambda value: value != expected,
+    "in": lambda expected: lambda value, allowed=_as_list(expected): value in allowed,
+    "not_in": lambda expected: lambda value, denied=_as_list(expected): value not in denied,
+    "gt": lambda expected: _compare(lambda a, b: a > b, expected),
+    "gte": lambda expected: _compare(lambda a, b: a >= b, expected),
+    "lt": lambda expected: _compare(lambda a, b: a < b, expected),
+    "lte": lambda expected: _compare(lambda a, b: a <= b, expected),
+}
+
+# Cheap equality checks run before checks that parse the answer
+_OPERATOR_COST = {"eq": 0, "ne": 0, "in": 1, "not_in": 1}
+
+
+def _keys_for(questions: List[Dict[str, Any]], defaults: Tuple[str, ...], match: Callable[[Dict[str, Any]], bool]) -> Tuple[str, ...]:
+    keys = list(defaults)
+    for q in questions:
+        q_id = q.get("id")
+        if q_id and q_id not in keys and match(q):
+            keys.append(q_id)
+    return tuple(keys)
+
+
+def compile_screening(survey: Dict[str, Any], questions: Optional[List[Dict[str, Any]]] = None) -> ScreeningRuleSet:
+    """
+    Compiles the snapshot's correct answers and the survey's Layer1Rules into a
+    ScreeningRuleSet. `questions` is the list shown to respondents and is only
+    used to resolve which answer keys hold gender and age; it defaults to the
+    snapshot questions.
+    """
+    snapshot_questions = survey.get("template_snapshot_questions", [])
+    if questions is None:
+        questions = snapshot_questions
+    rules = Layer1Rules(**(survey.get("layer1_rules") or {}))
+
+    equality_checks = []
+    for q in snapshot_questions:
+        q_id = q.get("id")
+        correct_val = q.get("correct_answer")
+        if q_id and correct_val is not None:
+            equality_checks.append(ScreeningCheck((q_id,), _equals(correct_val), correct_val))
+
+    condition_checks = []
+    for condition in rules.extra_conditions:
+        q_id = condition.get("question_id") or condition.get("id")
+        operator = condition.get("operator", "eq")
+        factory = CONDITION_OPERATORS.get(operator)
+        if not q_id or factory is None:
+            logger.warning(f"Skipping unsupported screening condition for survey {survey.get('_id')}: {condition}")
+            continue
+        expected = condition.get("value")
+        condition_checks.append((_OPERATOR_COST.get(operator, 2), ScreeningCheck((q_id,), factory(expected), expected)))
+    condition_checks.sort(key=lambda item: item[0])
+
+    demographic_checks = []
+    if rules.gender and rules.gender.strip().casefold() not in _ANY_VALUES:
+        gender_keys = _keys_for(
+            questions, GENDER_KEYS,
+            lambda q: "gender" in q.get("id", "").lower() or "gender" in str(q.get("label", "")).lower(),
+        )
+        demographic_checks.append(ScreeningCheck(gender_keys, _gender_matches(rules.gender), rules.gender))
+
+    if rules.age_min is not None or rules.age_max is not None:
+        age_keys = _keys_for(questions, AGE_KEYS, lambda q: q.get("type") == "age")
+        expected = f"{rules.age_min if rules.age_min is not None else ''}-{rules.age_max if rules.age_max is not None else ''}"
+        demographic_checks.append(ScreeningCheck(age_keys, _age_within(rules.age_min, rules.age_max), expected))
+
+    return ScreeningRuleSet(equality_checks + [check for _, check in condition_checks] + demographic_checks)
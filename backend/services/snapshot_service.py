@@ -0,0 +1,116 @@
+import copy
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from backend.config import settings
+from backend.database import db
+
+# Survey fields that hold an inline (legacy) copy of the template snapshot
+SNAPSHOT_FIELDS = {
+    "schema": "template_snapshot_schema",
+    "questions": "template_snapshot_questions",
+    "l2": "template_snapshot_l2",
+}
+
+
+def snapshot_hash(snapshot: Dict[str, Any]) -> str:
+    """sha256 of the canonical JSON form of {schema, questions, l2}."""
+    canonical = json.dumps(snapshot, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SnapshotService:
+    """
+    Content-addressed template snapshots in `template_snapshots`
+    ({_id: sha256, schema, questions, l2}). A snapshot is written once and
+    never updated, so surveys cloned from the same template version share
+    one document and hold only `template_snapshot_id`. Decoded snapshots are
+    kept in a per-process LRU; being immutable they never go stale.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _col():
+        return db.get_collection("template_snapshots")
+
+    def _remember(self, snapshot_id: str, snapshot: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        self._entries[snapshot_id] = snapshot
+        self._entries.move_to_end(snapshot_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def store(self, schema: Dict[str, Any], questions: List[Dict[str, Any]], l2: Optional[Dict[str, Any]]) -> str:
+        """Saves the snapshot if its content is new and returns its id (the content hash)."""
+        snapshot = {"schema": schema or {}, "questions": questions or [], "l2": l2 or {}}
+        snapshot_id = snapshot_hash(snapshot)
+        if snapshot_id not in self._entries:
+            try:
+                await self._col().update_one(
+                    {"_id": snapshot_id},
+                    {"$setOnInsert": {**snapshot, "created_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                pass  # a concurrent upsert stored the same content
+            self._remember(snapshot_id, snapshot)
+        return snapshot_id
+
+    async def get_many(self, snapshot_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Returns {snapshot_id: snapshot} for the ids that exist, reading only cache misses from MongoDB."""
+        found = {}
+        missing = []
+        for snapshot_id in set(snapshot_ids):
+            snapshot = self._entries.get(snapshot_id)
+            if snapshot is None:
+                self.misses += 1
+                missing.append(snapshot_id)
+            else:
+                self._entries.move_to_end(snapshot_id)
+                self.hits += 1
+                found[snapshot_id] = snapshot
+        if missing:
+            async for doc in self._col().find({"_id": {"$in": missing}}, {"created_at": 0}):
+                snapshot_id = doc.pop("_id")
+                self._remember(snapshot_id, doc)
+                found[snapshot_id] = doc
+        return found
+
+    async def resolve_many(self, surveys: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fills the template_snapshot_* fields of surveys that reference a
+        snapshot. Each survey gets its own copy, so callers may modify it.
+        Surveys that still carry an inline snapshot are left as they are.
+        """
+        pending = [s for s in surveys if s.get("template_snapshot_id") and SNAPSHOT_FIELDS["questions"] not in s]
+        snapshots = await self.get_many(s["template_snapshot_id"] for s in pending)
+        for survey in pending:
+            snapshot = snapshots.get(survey["template_snapshot_id"], {})
+            for key, field in SNAPSHOT_FIELDS.items():
+                survey[field] = copy.deepcopy(snapshot.get(key, {} if key != "questions" else []))
+        return surveys
+
+    async def resolve(self, survey: Dict[str, Any]) -> Dict[str, Any]:
+        await self.resolve_many([survey])
+        return survey
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+snapshot_service = SnapshotService(max_entries=settings.SNAPSHOT_CACHE_MAX_ENTRIES)
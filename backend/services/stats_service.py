@@ -0,0 +1,167 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from backend.database import db
+from backend.services.rollup_service import rollup_service
+from backend.utils.logging_utils import logger
+
+TOKEN_STATUSES = ("unused", "passed", "failed", "submitted")
+
+
+class SurveyStatsService:
+    """
+    Per-survey token status counters in the `survey_stats` collection
+    ({_id: survey_id, counts: {status: n}}), maintained with $inc on every
+    token creation and transition so dashboards read one small document.
+    A survey's counters are rebuilt from `tokens` (on the primary, whatever
+    the request's read route) the first time they are read and whenever
+    reconciliation runs. Each event is also recorded in the
+    time-bucketed rollups (see RollupService).
+    """
+
+    @staticmethod
+    def _col():
+        return db.get_collection("survey_stats")
+
+    @staticmethod
+    async def record_created(survey_id: str, count: int):
+        now = datetime.utcnow()
+        await asyncio.gather(
+            SurveyStatsService._col().update_one(
+                {"_id": survey_id},
+                {"$inc": {"counts.unused": count}, "$set": {"updated_at": now}},
+                upsert=True
+            ),
+            rollup_service.record({(survey_id, "created", now): count})
+        )
+
+    @staticmethod
+    async def record_transition(survey_id: str, from_status: str, to_status: str, count: int = 1):
+        if from_status == to_status or count == 0:
+            return
+        now = datetime.utcnow()
+        await asyncio.gather(
+            SurveyStatsService._col().update_one(
+                {"_id": survey_id},
+                {
+                    "$inc": {f"counts.{from_status}": -count, f"counts.{to_status}": count},
+                    "$set": {"updated_at": now}
+                },
+                upsert=True
+            ),
+            rollup_service.record({(survey_id, to_status, now): count})
+        )
+
+    @staticmethod
+    async def record_transitions(deltas: Dict[Tuple[str, str, str], int]):
+        """Applies {(survey_id, from_status, to_status): count} with one bulk_write."""
+        now = datetime.utcnow()
+        increments: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        rollup_events = defaultdict(int)
+        for (survey_id, from_status, to_status), count in deltas.items():
+            if from_status == to_status or count == 0:
+                continue
+            increments[survey_id][f"counts.{from_status}"] -= count
+            increments[survey_id][f"counts.{to_status}"] += count
+            rollup_events[(survey_id, to_status, now)] += count
+        if not increments:
+            return
+
+        await asyncio.gather(
+            SurveyStatsService._col().bulk_write(
+                [
+                    UpdateOne({"_id": survey_id}, {"$inc": dict(inc), "$set": {"updated_at": now}}, upsert=True)
+                    for survey_id, inc in increments.items()
+                ],
+                ordered=False
+            ),
+            rollup_service.record(dict(rollup_events))
+        )
+
+    @staticmethod
+    async def rebuild(survey_id: Optional[str] = None, survey_ids: Optional[List[str]] = None) -> int:
+        """
+        Recomputes counters from `tokens` for one survey, a list of surveys, or
+        every survey. Returns surveys rebuilt.
+        """
+        targets = [survey_id] if survey_id else list(survey_ids or [])
+        match = {"survey_id": {"$in": targets}} if targets else {}
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": {"survey_id": "$survey_id", "status": "$status"}, "count": {"$sum": 1}}}
+        ]
+        counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {s: 0 for s in TOKEN_STATUSES})
+        for sid in targets:
+            # Reset to zero even if the survey has no tokens left
+            counts[sid] = {s: 0 for s in TOKEN_STATUSES}
+        async for item in db.get_collection("tokens").aggregate(pipeline):
+            counts[item["_id"]["survey_id"]][item["_id"]["status"]] = item["count"]
+
+        if not counts:
+            return 0
+
+        now = datetime.utcnow()
+        await SurveyStatsService._col().bulk_write(
+            [
+                UpdateOne(
+                    {"_id": sid},
+                    {"$set": {"counts": survey_counts, "rebuilt_at": now, "updated_at": now}},
+                    upsert=True
+                )
+                for sid, survey_counts in counts.items()
+            ],
+            ordered=False
+        )
+        logger.info(f"Rebuilt survey_stats for {len(counts)} survey(s)")
+        return len(counts)
+
+    @staticmethod
+    def _normalize(counts: dict) -> Dict[str, int]:
+        summary = {s: max(int(counts.get(s, 0)), 0) for s in TOKEN_STATUSES}
+        summary["total"] = sum(summary.values())
+        return summary
+
+    @staticmethod
+    async def get_counts(survey_id: str) -> Dict[str, int]:
+        """Returns {unused, passed, failed, submitted, total} for a survey."""
+        doc = await SurveyStatsService._col().find_one({"_id": survey_id})
+        if not doc or "rebuilt_at" not in doc:
+            # The rebuild is persisted for good, so it must not count a lagging secondary
+            with db.reads("primary"):
+                await SurveyStatsService.rebuild(survey_id)
+                doc = await SurveyStatsService._col().find_one({"_id": survey_id})
+        return SurveyStatsService._normalize((doc or {}).get("counts", {}))
+
+    @staticmethod
+    async def get_counts_many(survey_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """get_counts for many surveys: one read, plus one rebuild for those never rebuilt."""
+        docs = {
+            doc["_id"]: doc
+            async for doc in SurveyStatsService._col().find({"_id": {"$in": survey_ids}})
+        }
+        stale = [sid for sid in survey_ids if "rebuilt_at" not in docs.get(sid, {})]
+        if stale:
+            with db.reads("primary"):
+                await SurveyStatsService.rebuild(survey_ids=stale)
+                async for doc in SurveyStatsService._col().find({"_id": {"$in": stale}}):
+                    docs[doc["_id"]] = doc
+        return {
+            sid: SurveyStatsService._normalize(docs.get(sid, {}).get("counts", {}))
+            for sid in survey_ids
+        }
+
+    @staticmethod
+    async def get_totals(survey_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Sums counters across surveys (all of them by default)."""
+        match = {"_id": {"$in": list(survey_ids)}} if survey_ids is not None else {}
+        group = {"_id": None}
+        group.update({s: {"$sum": f"$counts.{s}"} for s in TOKEN_STATUSES})
+        results = await SurveyStatsService._col().aggregate([{"$match": match}, {"$group": group}]).to_list(1)
+        return SurveyStatsService._normalize(results[0] if results else {})
+
+
+survey_stats_service = SurveyStatsService()
@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from backend.config import settings
+
+
+class SurveyCache:
+    """
+    In-process TTL + LRU cache for per-survey gateway data, keyed by survey_id.
+    Each worker process holds its own copy; the TTL bounds staleness across workers.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, survey_id: str) -> Optional[dict]:
+        item = self._entries.get(survey_id)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, entry = item
+        if expires_at < time.monotonic():
+            del self._entries[survey_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(survey_id)
+        self.hits += 1
+        return entry
+
+    def set(self, survey_id: str, entry: dict):
+        if self.max_entries <= 0:
+            return
+        self._entries[survey_id] = (time.monotonic() + self.ttl_seconds, entry)
+        self._entries.move_to_end(survey_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, survey_id: str):
+        self._entries.pop(str(survey_id), None)
+
+    def invalidate_template(self, template_id: str):
+        """Drops every cached survey built from the given template."""
+        template_id = str(template_id)
+        stale = [
+            survey_id for survey_id, (_, entry) in self._entries.items()
+            if entry.get("template_id") == template_id
+        ]
+        for survey_id in stale:
+            del self._entries[survey_id]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+survey_cache = SurveyCache(
+    ttl_seconds=settings.SURVEY_CACHE_TTL_SECONDS,
+    max_entries=settings.SURVEY_CACHE_MAX_ENTRIES,
+)
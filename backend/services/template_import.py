@@ -0,0 +1,179 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+from backend.config import settings
+from backend.database import db
+from backend.models import Template
+from backend.utils import template_parser
+from backend.utils.logging_utils import logger
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class TemplateImportService:
+    """
+    Imports questionnaire workbooks off the event loop. The workbook is read
+    once in a worker process, each sheet is parsed as its own process-pool
+    task, and progress is tracked in the `import_jobs` collection so any
+    API worker can answer polling requests.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks = set()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs the event loop and driver threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @staticmethod
+    def _jobs():
+        return db.get_collection("import_jobs")
+
+    @staticmethod
+    async def save_upload(file: UploadFile) -> str:
+        """Spools the upload to a temporary file in chunks and returns its path."""
+        suffix = os.path.splitext(file.filename)[1]
+        handle = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(handle.write, chunk)
+        finally:
+            handle.close()
+        return handle.name
+
+    async def create_job(self, filename: str, created_by: str) -> str:
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        await self._jobs().insert_one({
+            "_id": job_id,
+            "filename": filename,
+            "status": "queued",
+            "progress": 0,
+            "step": "queued",
+            "template_id": None,
+            "error": None,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now
+        })
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        return await self._jobs().find_one({"_id": job_id})
+
+    async def _update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        await self._jobs().update_one({"_id": job_id}, {"$set": fields})
+
+    def start(self, job_id: str, path: str, filename: str):
+        """Runs the import in the background; the job document reports progress."""
+        task = asyncio.create_task(self._run_background(job_id, path, filename))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_background(self, job_id: str, path: str, filename: str):
+        try:
+            await self.run(job_id, path, filename)
+        except HTTPException:
+            pass  # already recorded on the job document
+
+    async def run(self, job_id: str, path: str, filename: str) -> dict:
+        """Parses the workbook at `path`, creates the template and returns it. Removes `path` when done."""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        sheet_names = [template_parser.SCREENING_SHEET] + template_parser.EVALUATION_SHEETS
+        total_steps = len(sheet_names) + 2  # read + one per sheet + save
+        done = 0
+
+        try:
+            await self._update(job_id, status="running", step="reading workbook")
+            try:
+                sheets = await loop.run_in_executor(pool, template_parser.read_workbook_rows, path, sheet_names)
+            except Exception as e:
+                logger.error(f"Workbook read failed for {filename}: {e}")
+                sheets = {}
+            done += 1
+            await self._update(job_id, step="parsing sheets", progress=int(done / total_steps * 100))
+
+            # 1. Parse Layer 1 (Screening) and 2. Layer 2 (Evaluation Sheets) in parallel
+            futures = {}
+            if template_parser.SCREENING_SHEET in sheets:
+                futures[template_parser.SCREENING_SHEET] = loop.run_in_executor(
+                    pool, template_parser.parse_screening_rows, sheets[template_parser.SCREENING_SHEET]
+                )
+            for sheet in template_parser.EVALUATION_SHEETS:
+                if sheet in sheets:
+                    futures[sheet] = loop.run_in_executor(
+                        pool, template_parser.parse_evaluation_rows, sheet, sheets[sheet]
+                    )
+            del sheets
+
+            results = {}
+            for sheet, future in futures.items():
+                try:
+                    results[sheet] = await future
+                except Exception as e:
+                    logger.error(f"{sheet} parse failed: {str(e)}")
+                done += 1
+                await self._update(job_id, progress=int(done / total_steps * 100))
+
+            l1_questions = results.get(template_parser.SCREENING_SHEET) or []
+            l2_structure = {"sections": [
+                results[sheet] for sheet in template_parser.EVALUATION_SHEETS if results.get(sheet)
+            ]}
+
+            # 3. Create Template
+            await self._update(job_id, step="saving template")
+            new_template = Template(
+                name=f"Imported: {filename.split('.')[0]}",
+                type="taste_test",
+                version=1,
+                layer1_questions=l1_questions,
+                layer1_structure={"sections": [{"title": "Screening", "questions": l1_questions}]} if l1_questions else {"sections": []},
+                layer1_question_schema={}, # Can be generated if needed
+                layer2_structure=l2_structure,
+                created_at=datetime.utcnow()
+            )
+
+            templates_col = db.get_collection("templates")
+            result = await templates_col.insert_one(
+                new_template.model_dump(by_alias=True, exclude=["id"])
+            )
+            created = await templates_col.find_one({"_id": result.inserted_id})
+            await self._update(
+                job_id, status="completed", step="done", progress=100, template_id=str(result.inserted_id)
+            )
+            return created
+
+        except Exception as e:
+            logger.error(f"Template import {job_id} failed: {e}")
+            await self._update(job_id, status="failed", step="failed", error=str(e))
+            raise HTTPException(status_code=500, detail=f"Failed to parse file: {str(e)}")
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+template_import_service = TemplateImportService(max_workers=settings.TEMPLATE_IMPORT_WORKERS)
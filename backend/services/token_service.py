@@ -1,7 +1,10 @@
-from datetime import datetime
-from typing import Optional
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, List, Optional
 from fastapi import HTTPException, status
+from backend.config import settings
 from backend.database import db
+from backend.services.stats_service import survey_stats_service
 from backend.models import Token
 
 class TokenService:
@@ -16,48 +19,101 @@ class TokenService:
         return await tokens_col.find_one({"token": token_str})
 
     @staticmethod
-    async def update_token_status(token_str: str, new_status: str) -> bool:
+    def allowed_from_states(new_status: str) -> list:
+        return [
+            from_status for from_status, targets in TokenService.ALLOWED_TRANSITIONS.items()
+            if new_status in targets
+        ]
+
+    @staticmethod
+    async def transition(token_str: str, new_status: str, extra_fields: Optional[dict] = None) -> dict:
         """
-        Atomically updates the token status using find_one_and_update with a status guard.
+        Moves a token to `new_status` in a single find_one_and_update guarded by
+        `status $in <allowed from-states>`, setting `extra_fields` in the same write.
+        Returns the post-image. Only on failure is the token re-read, to tell
+        "not found" apart from an invalid transition.
+        The pre-image is fetched so the survey's status counters can be moved.
         """
         tokens_col = db.get_collection("tokens")
-        
-        # 1. Get current token to check allowed transition
-        token_doc = await tokens_col.find_one({"token": token_str})
+
+        update_fields = {
+            "status": new_status,
+            "last_accessed": datetime.utcnow()
+        }
+        if extra_fields:
+            update_fields.update(extra_fields)
+
+        previous = await tokens_col.find_one_and_update(
+            {"token": token_str, "status": {"$in": TokenService.allowed_from_states(new_status)}},
+            {"$set": update_fields},
+            return_document=False
+        )
+        if previous:
+            await survey_stats_service.record_transition(previous["survey_id"], previous["status"], new_status)
+            return {**previous, **update_fields}
+
+        token_doc = await tokens_col.find_one({"token": token_str}, {"status": 1})
         if not token_doc:
             raise HTTPException(status_code=404, detail="Token not found")
-        
-        current_status = token_doc.get("status", "unused")
-        
-        # 2. Validate transition
-        allowed = TokenService.ALLOWED_TRANSITIONS.get(current_status, [])
-        if new_status not in allowed:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid state transition: {current_status} -> {new_status}"
-            )
 
-        # 3. Atomic update with status guard
-        result = await tokens_col.find_one_and_update(
-            {"token": token_str, "status": current_status},
-            {
-                "$set": {
-                    "status": new_status,
-                    "last_accessed": datetime.utcnow()
-                }
-            },
-            return_document=True
+        current_status = token_doc.get("status", "unused")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid state transition: {current_status} -> {new_status}"
         )
-        
-        if not result:
-            # This happens if status changed between step 1 and 3 (race condition)
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="State transition failed due to concurrent update"
-            )
-            
+
+    @staticmethod
+    async def update_token_status(token_str: str, new_status: str) -> bool:
+        """Atomically updates the token status. See `transition`."""
+        await TokenService.transition(token_str, new_status)
         return True
 
+    @staticmethod
+    def new_batch_id() -> str:
+        return str(uuid.uuid4())[:8] # Short batch ID for readability
+
+    @staticmethod
+    async def generate_token_batches(
+        survey_id: str,
+        count: int,
+        created_by: str,
+        token_factory: Callable[[], str],
+        batch_id: str,
+        chunk_size: Optional[int] = None,
+        expires_at: Optional[datetime] = None
+    ) -> AsyncIterator[List[str]]:
+        """
+        Inserts `count` unused tokens in chunks of `chunk_size` with unordered
+        insert_many, yielding each chunk's token strings once it is stored.
+        Memory stays bounded by one chunk regardless of `count`.
+        """
+        tokens_col = db.get_collection("tokens")
+        chunk_size = chunk_size or settings.TOKEN_INSERT_BATCH_SIZE
+        # Default expiry 30 days if not specified
+        expires_at = expires_at or datetime.utcnow() + timedelta(days=30)
+
+        remaining = count
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            created_at = datetime.utcnow()
+            token_documents = [
+                {
+                    "survey_id": survey_id,
+                    "token": token_factory(),
+                    "status": "unused",
+                    "batch_id": batch_id,
+                    "created_by": created_by,
+                    "created_at": created_at,
+                    "expires_at": expires_at,
+                    "last_accessed": None
+                }
+                for _ in range(size)
+            ]
+            await tokens_col.insert_many(token_documents, ordered=False)
+            await survey_stats_service.record_created(survey_id, size)
+            remaining -= size
+            yield [doc["token"] for doc in token_documents]
+
     @staticmethod
     async def record_access(token_str: str):
         """Atomically updates the last_accessed timestamp."""
@@ -0,0 +1,221 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+from backend.config import settings
+from backend.database import db
+from backend.models import Response
+from backend.services.orphan_service import CONCURRENT_UPDATE_REASON, INGEST_FAILURE_REASON, orphan_service
+from backend.services.idempotency import webhook_idempotency
+from backend.services.token_service import TokenService
+from backend.services.stats_service import survey_stats_service
+from backend.services.answer_cache import answer_cache
+from backend.utils.logging_utils import logger
+from backend.utils import token_codec
+
+
+class WebhookIngestQueue:
+    """
+    Bounded in-process queue for Google Form webhook payloads.
+    The webhook acknowledges after enqueueing; a background worker drains the
+    queue in micro-batches with one bulk_write of token transitions, one
+    insert_many into `responses` and one insert_many of orphans per batch.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, max_wait_ms: int):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(f"Webhook ingest queue started (max_size={self.max_size}, batch_size={self.batch_size})")
+
+    async def stop(self, timeout: float = 10.0):
+        """Flushes whatever is queued, then stops the worker."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Webhook ingest queue stopped with {self.queue.qsize()} payloads unprocessed")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def submit(self, payload: dict) -> bool:
+        """Enqueues a payload without waiting. Returns False when the queue is saturated."""
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "depth": self.queue.qsize() if self.queue else 0,
+            "max_size": self.max_size,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "batches": self.batches,
+        }
+
+    async def _next_batch(self) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            keys = [webhook_idempotency.key_for(payload) for payload in batch]
+            try:
+                await self._process(batch)
+            except Exception as e:
+                logger.error(f"Webhook ingest batch of {len(batch)} failed: {e}")
+                try:
+                    await orphan_service.log_many([(payload, INGEST_FAILURE_REASON) for payload in batch])
+                    for key in keys:
+                        await webhook_idempotency.release(key)
+                except Exception as log_error:
+                    logger.error(f"Failed to record ingest failure orphans: {log_error}")
+            else:
+                try:
+                    await webhook_idempotency.complete_many(keys)
+                except Exception as e:
+                    # The claims stay pending and go stale, so a retry is let through later
+                    logger.error(f"Failed to complete {len(keys)} webhook delivery claims: {e}")
+            finally:
+                self.processed += len(batch)
+                self.batches += 1
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _process(self, batch: List[dict]):
+        # MongoDB stores milliseconds; truncate so the timestamp can be matched back
+        now = datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+        orphans = []
+        payloads_by_token = {}
+        for payload in batch:
+            token_str = payload.get("token")
+            if not token_str:
+                orphans.append((payload, "missing_token"))
+                continue
+            if not token_codec.is_plausible(token_str):
+                orphans.append((payload, "malformed_token"))
+                continue
+            token_str = token_codec.normalize(token_str)
+            if token_str in payloads_by_token:
+                # Only the first submission for a token in the batch can win
+                orphans.append((payload, "invalid_transition_Invalid state transition: submitted -> submitted"))
+            else:
+                payloads_by_token[token_str] = payload
+
+        tokens_col = db.get_collection("tokens")
+        from_states = TokenService.allowed_from_states("submitted")
+        eligible = []
+        if payloads_by_token:
+            token_docs = await tokens_col.find(
+                {"token": {"$in": list(payloads_by_token)}},
+                {"token": 1, "status": 1, "survey_id": 1, "phone": 1}
+            ).to_list(None)
+            found = {doc["token"]: doc for doc in token_docs}
+
+            for token_str, payload in payloads_by_token.items():
+                token_doc = found.get(token_str)
+                if not token_doc:
+                    orphans.append((payload, "invalid_transition_Token not found"))
+                    continue
+                current_status = token_doc.get("status", "unused")
+                if current_status not in from_states:
+                    orphans.append((payload, f"invalid_transition_Invalid state transition: {current_status} -> submitted"))
+                    continue
+                eligible.append(token_doc)
+
+        if eligible:
+            result = await tokens_col.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": doc["_id"], "status": {"$in": from_states}},
+                        {"$set": {"status": "submitted", "last_accessed": now}}
+                    )
+                    for doc in eligible
+                ],
+                ordered=False
+            )
+
+            if result.modified_count < len(eligible):
+                # Some tokens changed state between the read and the write
+                moved = await tokens_col.find(
+                    {"_id": {"$in": [doc["_id"] for doc in eligible]}, "status": "submitted", "last_accessed": now},
+                    {"_id": 1}
+                ).to_list(None)
+                moved_ids = {doc["_id"] for doc in moved}
+                for doc in eligible:
+                    if doc["_id"] not in moved_ids:
+                        orphans.append((payloads_by_token[doc["token"]], CONCURRENT_UPDATE_REASON))
+                eligible = [doc for doc in eligible if doc["_id"] in moved_ids]
+
+        if eligible:
+            deltas = {}
+            for doc in eligible:
+                key = (doc["survey_id"], doc.get("status", "unused"), "submitted")
+                deltas[key] = deltas.get(key, 0) + 1
+            await survey_stats_service.record_transitions(deltas)
+
+            response_docs = [
+                Response(
+                    survey_id=doc["survey_id"],
+                    token=doc["token"],
+                    phone=doc.get("phone"),
+                    answers=payloads_by_token[doc["token"]].get("answers", {}),
+                    source="layer2"
+                ).model_dump(by_alias=True, exclude=["id"])
+                for doc in eligible
+            ]
+            await db.get_collection("responses").insert_many(response_docs, ordered=False)
+            for survey_id in {doc["survey_id"] for doc in response_docs}:
+                answer_cache.mark_stale(survey_id)
+
+        await orphan_service.log_many(orphans)
+        logger.info(f"Webhook batch ingested: {len(eligible)} finalized, {len(orphans)} orphaned")
+
+
+webhook_ingest_queue = WebhookIngestQueue(
+    max_size=settings.WEBHOOK_QUEUE_MAX_SIZE,
+    batch_size=settings.WEBHOOK_BATCH_SIZE,
+    max_wait_ms=settings.WEBHOOK_BATCH_MAX_WAIT_MS,
+)
@@ -1,6 +1,9 @@
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
 from backend.config import settings
+from backend.services.orphan_service import RECOVERABLE_REASONS
+from backend.utils.migrations import StartupMigrations
 
 async def create_indexes():
     client = AsyncIOMotorClient(settings.MONGO_URI)
@@ -16,18 +19,72 @@ async def create_indexes():
     await tokens_col.create_index("token", unique=True)
     await tokens_col.create_index("status")
     await tokens_col.create_index("survey_id")
+    await tokens_col.create_index("batch_id")
     await tokens_col.create_index("created_at")
     await tokens_col.create_index("last_accessed")
+    # Keyset pagination of token listings: one index per filter combination, each
+    # with its equality fields directly followed by the (created_at, _id) sort
+    await tokens_col.create_index([("survey_id", 1), ("created_at", -1), ("_id", -1)])
+    await tokens_col.create_index([("survey_id", 1), ("status", 1), ("created_at", -1), ("_id", -1)])
+    await tokens_col.create_index([("survey_id", 1), ("batch_id", 1), ("created_at", -1), ("_id", -1)])
+    await tokens_col.create_index(
+        [("survey_id", 1), ("status", 1), ("batch_id", 1), ("created_at", -1), ("_id", -1)]
+    )
     
     # Surveys Indexes
     surveys_col = db.get_collection("surveys")
     await surveys_col.create_index("template_id")
     await surveys_col.create_index("status")
+    # Listing indexes over live surveys only (also run at startup)
+    await StartupMigrations.backfill_survey_soft_delete_flag(db)
 
-    # Orphan Submissions Indexes
+    # Responses Indexes (per-survey exports walk _id order)
+    responses_col = db.get_collection("responses")
+    await responses_col.create_index([("survey_id", 1), ("_id", 1)])
+
+    # Survey Demographics Indexes (_id is "survey_id|phone")
+    demographics_col = db.get_collection("survey_demographics")
+    await demographics_col.create_index("survey_id")
+
+    # Trend Rollup Indexes
+    rollups_col = db.get_collection("survey_rollups")
+    await rollups_col.create_index([("survey_id", 1), ("granularity", 1), ("bucket", 1)])
+
+    # Orphan Submissions Indexes (raw records expire; per-reason detail lists read newest first)
     orphans_col = db.get_collection("orphan_submissions")
-    await orphans_col.create_index("timestamp")
-    await orphans_col.create_index("reason")
+    for legacy_index in ("timestamp_1", "reason_1"):
+        try:
+            await orphans_col.drop_index(legacy_index)
+        except OperationFailure:
+            pass
+    # Records kept for replay (recoverable: true) never expire; older records predate the flag
+    await orphans_col.update_many(
+        {"recoverable": {"$exists": False}},
+        [{"$set": {"recoverable": {"$in": ["$reason", list(RECOVERABLE_REASONS)]}}}]
+    )
+    await orphans_col.create_index(
+        "timestamp",
+        expireAfterSeconds=settings.ORPHAN_RETENTION_DAYS * 24 * 3600,
+        partialFilterExpression={"recoverable": False}
+    )
+    await orphans_col.create_index([("reason", 1), ("timestamp", -1)])
+
+    # Orphan Counter Indexes (_id is "reason|minute")
+    orphan_counters_col = db.get_collection("orphan_counters")
+    await orphan_counters_col.create_index(
+        "minute", expireAfterSeconds=settings.ORPHAN_COUNTER_RETENTION_DAYS * 24 * 3600
+    )
+    await orphan_counters_col.create_index([("reason", 1), ("minute", 1)])
+
+    # Webhook Delivery Dedup Indexes (keys expire after the idempotency window)
+    deliveries_col = db.get_collection("webhook_deliveries")
+    await deliveries_col.create_index(
+        "created_at", expireAfterSeconds=settings.WEBHOOK_IDEMPOTENCY_TTL_SECONDS
+    )
+
+    # Template Import Jobs Indexes (job records expire after a week)
+    import_jobs_col = db.get_collection("import_jobs")
+    await import_jobs_col.create_index("created_at", expireAfterSeconds=7 * 24 * 3600)
 
     # Respondents Indexes
     respondents_col = db.get_collection("respondents")
@@ -1,48 +1,146 @@
+import json
 import logging
+import queue
+import random
 import sys
 import time
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
+
+from backend.config import settings
+from backend.utils.metrics import current_request, metrics, route_template
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, any `extra` fields and the traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
 
 # Configure logging
-def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+def setup_logging(stream: Optional[TextIO] = None):
+    """
+    Routes all logging through a QueueHandler so request handlers never block
+    on stdout; a QueueListener thread formats and writes the records.
+    LOG_FORMAT selects JSON lines (default) or the classic text format.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(stream or sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 logger = logging.getLogger("survey_platform")
+access_logger = logging.getLogger("survey_platform.access")
+
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable):
-        start_time = time.time()
-        
-        # Log request details
-        method = request.method
-        url = request.url.path
-        client_host = request.client.host if request.client else "unknown"
-        
-        logger.info(f"Incoming request: {method} {url} from {client_host}")
-        
+class LoggingMiddleware:
+    """
+    Pure ASGI request timing and access logging. Unlike BaseHTTPMiddleware it
+    adds no task or memory stream per request, so streamed responses keep
+    their backpressure; it only wraps `send` to see the status code.
+
+    Every request feeds the metrics registry. Access log lines are sampled:
+    ACCESS_LOG_SAMPLE_RATE of 2xx/3xx, ACCESS_LOG_CLIENT_ERROR_SAMPLE_RATE of
+    4xx, and always 5xx, failures and requests slower than ACCESS_LOG_SLOW_MS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.sample_rate = settings.ACCESS_LOG_SAMPLE_RATE
+        self.client_error_sample_rate = settings.ACCESS_LOG_CLIENT_ERROR_SAMPLE_RATE
+        self.slow_seconds = settings.ACCESS_LOG_SLOW_MS / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.started(method)
+        context_token = current_request.set(scope)
         try:
-            response = await call_next(request)
-            
-            process_time = (time.time() - start_time) * 1000
-            status_code = response.status_code
-            
-            logger.info(
-                f"Completed request: {method} {url} - Status: {status_code} - Duration: {process_time:.2f}ms"
-            )
-            
-            return response
-        except Exception as e:
-            process_time = (time.time() - start_time) * 1000
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            elapsed = time.perf_counter() - start_time
+            metrics.finished(method, route_template(scope), 500, elapsed)
             logger.error(
-                f"Request failed: {method} {url} - Error: {str(e)} - Duration: {process_time:.2f}ms",
-                exc_info=True
+                f"Request failed: {method} {scope['path']} - Duration: {elapsed * 1000:.2f}ms",
+                exc_info=True,
+                extra=self._fields(scope, 500, elapsed)
             )
             raise
+        finally:
+            current_request.reset(context_token)
+
+        elapsed = time.perf_counter() - start_time
+        metrics.finished(method, route_template(scope), status_code, elapsed)
+        if self._sampled(status_code, elapsed):
+            access_logger.info(
+                f"{method} {scope['path']} {status_code} {elapsed * 1000:.2f}ms",
+                extra=self._fields(scope, status_code, elapsed)
+            )
+
+    def _sampled(self, status_code: int, elapsed: float) -> bool:
+        if status_code >= 500 or elapsed >= self.slow_seconds:
+            return True
+        rate = self.client_error_sample_rate if status_code >= 400 else self.sample_rate
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    @staticmethod
+    def _fields(scope, status_code: int, elapsed: float) -> dict:
+        client = scope.get("client")
+        return {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+            "client": client[0] if client else "unknown",
+        }
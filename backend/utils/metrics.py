@@ -0,0 +1,172 @@
+import math
+import os
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Latency bucket upper bounds in seconds: 4 linear sub-buckets per power of two
+# from 2^-13 s (~0.12 ms) to 2^6 s (64 s), so any recorded value is known to
+# within 25% (HDR-style bounded relative error) with a fixed-size array.
+SUB_BUCKETS = 4
+BUCKET_BOUNDS: Tuple[float, ...] = tuple(
+    math.ldexp(1 + k / SUB_BUCKETS, exponent)
+    for exponent in range(-13, 6)
+    for k in range(SUB_BUCKETS)
+) + (64.0,)
+# Only the power-of-two edges are exported as Prometheus `le` buckets; the
+# finer buckets still drive the quantile gauges
+EXPORT_BOUNDS = tuple(i for i, bound in enumerate(BUCKET_BOUNDS) if math.frexp(bound)[0] == 0.5)
+QUANTILES = (0.5, 0.9, 0.99)
+
+UNMATCHED_ROUTE = "<unmatched>"
+BACKGROUND_ROUTE = "<background>"
+
+# ASGI scope of the request being handled, set by LoggingMiddleware. Motor copies
+# the context into its executor threads, so database listeners can see it too.
+current_request: ContextVar[Optional[dict]] = ContextVar("current_request", default=None)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; recording is one bisect and two adds."""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # last slot: above the largest bound
+        self.count = 0
+        self.sum = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th value (inf if past the last bound)."""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else math.inf
+        return math.inf
+
+
+def route_template(scope: dict) -> str:
+    """
+    Path template of the route that handled `scope` (e.g. "/s/{token}"), as
+    recorded by the router, so raw paths never become labels.
+    """
+    return getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+
+
+def current_route() -> str:
+    """Route template of the request in the current context, or BACKGROUND_ROUTE outside one."""
+    scope = current_request.get()
+    return route_template(scope) if scope is not None else BACKGROUND_ROUTE
+
+
+def _labels(**labels: Any) -> str:
+    return ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+
+
+def _number(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    In-process request metrics for one worker: a latency histogram and
+    status counts per (method, route template), plus in-flight gauges per
+    method (the route is only known once the router has matched it).
+    Updates are plain attribute/dict writes on the event loop thread, so no
+    locking is needed. Every series carries the worker pid, since each
+    gunicorn worker keeps its own registry.
+    """
+
+    def __init__(self):
+        self._latency: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._status: Dict[Tuple[str, str, int], int] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._stats_sources: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+    def started(self, method: str):
+        self._in_flight[method] = self._in_flight.get(method, 0) + 1
+
+    def finished(self, method: str, route: str, status: int, seconds: float):
+        self._in_flight[method] -= 1
+        key = (method, route)
+        histogram = self._latency.get(key)
+        if histogram is None:
+            histogram = self._latency[key] = LatencyHistogram()
+        histogram.record(seconds)
+        status_key = (method, route, status)
+        self._status[status_key] = self._status.get(status_key, 0) + 1
+
+    def register_stats(self, name: str, source: Callable[[], Dict[str, Any]]):
+        """Exports the numeric values of `source()` as `survey_platform_<name>_<key>` gauges."""
+        self._stats_sources.append((name, source))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        worker = os.getpid()  # read per render: the registry may be imported before gunicorn forks
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self._latency.items()):
+            labels = _labels(worker=worker, method=method, route=route)
+            cumulative = 0
+            previous = 0
+            for i in EXPORT_BOUNDS:
+                cumulative += sum(histogram.counts[previous:i + 1])
+                previous = i + 1
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{_number(BUCKET_BOUNDS[i])}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {_number(histogram.sum)}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        lines += [
+            "# HELP http_request_duration_quantile_seconds Latency quantile upper bound (within 25%) since start.",
+            "# TYPE http_request_duration_quantile_seconds gauge",
+        ]
+        for (method, route), histogram in sorted(self._latency.items()):
+            for q in QUANTILES:
+                labels = _labels(worker=worker, method=method, route=route, quantile=q)
+                lines.append(f"http_request_duration_quantile_seconds{{{labels}}} {_number(histogram.quantile(q))}")
+
+        lines += [
+            "# HELP http_requests_total Completed requests by route template and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(self._status.items()):
+            lines.append(f"http_requests_total{{{_labels(worker=worker, method=method, route=route, status=status)}}} {count}")
+
+        lines += [
+            "# HELP http_requests_in_progress Requests currently being handled.",
+            "# TYPE http_requests_in_progress gauge",
+        ]
+        for method, count in sorted(self._in_flight.items()):
+            lines.append(f"http_requests_in_progress{{{_labels(worker=worker, method=method)}}} {count}")
+
+        for name, source in self._stats_sources:
+            for key, value in source().items():
+                if isinstance(value, (int, float)):
+                    metric = f"survey_platform_{name}_{key}"
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines.append(f"{metric}{{{_labels(worker=worker)}}} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,47 @@
+from backend.utils.logging_utils import logger
+
+
+class StartupMigrations:
+    """
+    Idempotent data migrations the API depends on, run from the app lifespan
+    (and by db_indexes.py). Until one has completed in this process, the code
+    reading the migrated data falls back to a query that works either way.
+    """
+
+    def __init__(self):
+        self.survey_soft_delete_flag = False
+
+    @staticmethod
+    async def backfill_survey_soft_delete_flag(database):
+        """Surveys created before the soft-delete flag lack `is_deleted`; the listing indexes only cover `False`."""
+        surveys_col = database.get_collection("surveys")
+        result = await surveys_col.update_many({"is_deleted": {"$exists": False}}, {"$set": {"is_deleted": False}})
+        await surveys_col.create_index(
+            [("status", 1), ("created_at", -1), ("_id", -1)],
+            partialFilterExpression={"is_deleted": False}
+        )
+        await surveys_col.create_index(
+            [("created_at", -1), ("_id", -1)],
+            partialFilterExpression={"is_deleted": False}
+        )
+        return result.modified_count
+
+    async def run(self, database):
+        """Runs every migration; a failure is logged and the fallback queries stay in use."""
+        try:
+            backfilled = await self.backfill_survey_soft_delete_flag(database)
+        except Exception as e:
+            logger.error(f"Survey soft-delete flag backfill failed: {e}")
+            return
+        self.survey_soft_delete_flag = True
+        if backfilled:
+            logger.info(f"Backfilled is_deleted on {backfilled} surveys")
+
+    def not_deleted_surveys(self) -> dict:
+        """Filter for live surveys: the indexed form once the backfill has run, otherwise one that matches a missing flag."""
+        if self.survey_soft_delete_flag:
+            return {"is_deleted": False}
+        return {"is_deleted": {"$ne": True}}
+
+
+startup_migrations = StartupMigrations()
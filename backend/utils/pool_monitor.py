@@ -0,0 +1,124 @@
+import threading
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+
+class _PoolStats:
+    __slots__ = ("open", "in_use", "created", "closed", "checkouts", "checkout_failures",
+                 "checkout_timeouts", "wait_total", "wait_max", "cleared")
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_timeouts = 0  # pool exhausted for longer than waitQueueTimeoutMS
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.cleared = 0
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Connection pool counters per server, fed by pymongo CMAP events (the
+    driver exposes no pool statistics API). Events arrive on driver and
+    executor threads, so updates are guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, _PoolStats] = {}
+
+    def _pool(self, address) -> _PoolStats:
+        key = "%s:%s" % address
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _PoolStats()
+        return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address).cleared += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop("%s:%s" % event.address, None)
+
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.open += 1
+            pool.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.open -= 1
+            pool.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.checkout_failures += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                pool.checkout_timeouts += 1
+
+    def connection_checked_out(self, event):
+        wait = event.duration or 0.0
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.in_use += 1
+            pool.checkouts += 1
+            pool.wait_total += wait
+            pool.wait_max = max(pool.wait_max, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address).in_use -= 1
+
+    def pools(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                address: {
+                    "open": pool.open,
+                    "in_use": pool.in_use,
+                    "idle": pool.open - pool.in_use,
+                    "created": pool.created,
+                    "closed": pool.closed,
+                    "checkouts": pool.checkouts,
+                    "checkout_failures": pool.checkout_failures,
+                    "checkout_timeouts": pool.checkout_timeouts,
+                    "checkout_wait_mean_ms": round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                    "checkout_wait_max_ms": round(pool.wait_max * 1000, 3),
+                    "cleared": pool.cleared,
+                }
+                for address, pool in self._pools.items()
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals across all servers."""
+        totals: Dict[str, Any] = {"servers": 0, "open": 0, "in_use": 0, "checkouts": 0, "checkout_failures": 0, "checkout_timeouts": 0}
+        for pool in self.pools().values():
+            totals["servers"] += 1
+            for key in ("open", "in_use", "checkouts", "checkout_failures", "checkout_timeouts"):
+                totals[key] += pool[key]
+        return totals
+
+
+pool_monitor = PoolMonitor()
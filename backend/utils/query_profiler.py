@@ -0,0 +1,203 @@
+import hashlib
+import heapq
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from backend.config import settings
+from backend.utils.logging_utils import logger
+from backend.utils.metrics import current_route
+
+# Commands that carry a filter or pipeline worth profiling; others (hello, ping, endSessions...) are ignored
+PROFILED_COMMANDS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "update": "updates",
+    "delete": "deletes",
+    "insert": None,
+    "getMore": None,
+}
+# Commands explain() accepts
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Driver bookkeeping that must not be replayed through explain()
+_SESSION_FIELDS = {"lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "readConcern", "writeConcern"}
+
+OTHER_SHAPE = "<other>"
+
+
+def query_shape(value: Any) -> Any:
+    """Filter/pipeline with every literal replaced by "?" (keys and operators kept)."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(value[0])] if value else []
+    return "?"
+
+
+def _statement_shape(command_name: str, command: dict) -> Any:
+    field = PROFILED_COMMANDS.get(command_name)
+    if field is None:
+        return None
+    value = command.get(field)
+    if command_name == "update" and value:
+        return {"q": query_shape(value[0].get("q")), "u": query_shape(value[0].get("u"))}
+    if command_name == "delete" and value:
+        return {"q": query_shape(value[0].get("q"))}
+    if command_name == "find" and command.get("sort"):
+        return {"filter": query_shape(value or {}), "sort": query_shape(command["sort"])}
+    return query_shape(value)
+
+
+class _OperationStats:
+    __slots__ = ("count", "failures", "total_ms", "max_ms", "sample", "servers")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.sample: Optional[dict] = None  # last full command, replayed by explain()
+        self.servers: Dict[str, int] = {}  # "host:port" -> operations it served
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """
+    pymongo command listener recording every profiled operation by
+    (collection, command, filter shape, calling route). It keeps totals per
+    shape plus the QUERY_PROFILER_TOP_N slowest individual operations, and
+    logs operations slower than QUERY_PROFILER_SLOW_MS.
+
+    Events arrive on Motor's executor threads (which carry the request
+    context, hence the route), so shared state is guarded by a lock.
+    """
+
+    def __init__(self, top_n: int, slow_ms: float, max_shapes: int):
+        self.top_n = top_n
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, str, str, dict]] = {}
+        self._operations: Dict[str, Dict[str, Any]] = {}
+        self._stats: Dict[str, _OperationStats] = {}
+        self._slowest: List[Tuple[float, int, dict]] = []  # min-heap on duration
+        self._sequence = 0
+
+    @staticmethod
+    def shape_id(collection: str, command_name: str, shape: str, route: str) -> str:
+        return hashlib.sha1(f"{collection}|{command_name}|{shape}|{route}".encode("utf-8")).hexdigest()[:12]
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name not in PROFILED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        shape = json.dumps(_statement_shape(event.command_name, command), default=str)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                str(collection), event.command_name, shape, current_route(),
+                command if event.command_name in EXPLAINABLE else None
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        duration_ms = event.duration_micros / 1000
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+            if pending is None:
+                return
+            collection, command_name, shape, route, command = pending
+            key = self.shape_id(collection, command_name, shape, route)
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_shapes:
+                    shape, command = OTHER_SHAPE, None
+                    key = self.shape_id(collection, command_name, shape, route)
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = _OperationStats()
+                    self._operations[key] = {
+                        "shape_id": key, "collection": collection, "command": command_name,
+                        "shape": shape, "route": route
+                    }
+            stats.count += 1
+            stats.failures += failed
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            if command is not None:
+                stats.sample = command
+            server = "%s:%s" % event.connection_id
+            stats.servers[server] = stats.servers.get(server, 0) + 1
+
+            entry = (duration_ms, self._sequence, {"shape_id": key, "duration_ms": round(duration_ms, 3), "at": time.time(), "failed": failed})
+            self._sequence += 1
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, entry)
+            elif duration_ms > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+        if duration_ms >= self.slow_ms:
+            logger.warning(
+                f"Slow MongoDB {command_name} on {collection}: {duration_ms:.1f}ms",
+                extra={"collection": collection, "command": command_name, "shape": shape, "route": route, "duration_ms": round(duration_ms, 3)}
+            )
+
+    def report(self, limit: int = 50) -> Dict[str, Any]:
+        """Operations by total time spent, and the slowest individual operations."""
+        with self._lock:
+            operations = [
+                {
+                    **self._operations[key],
+                    "count": stats.count,
+                    "failures": stats.failures,
+                    "total_ms": round(stats.total_ms, 3),
+                    "mean_ms": round(stats.total_ms / stats.count, 3),
+                    "max_ms": round(stats.max_ms, 3),
+                    "explainable": stats.sample is not None,
+                    "servers": dict(stats.servers),
+                }
+                for key, stats in self._stats.items()
+            ]
+            slowest = [
+                {**self._operations[sample["shape_id"]], **sample}
+                for _, _, sample in sorted(self._slowest, reverse=True)
+            ]
+        operations.sort(key=lambda op: op["total_ms"], reverse=True)
+        return {"since": self.started_at, "shapes": len(operations), "operations": operations[:limit], "slowest": slowest}
+
+    def explain_command(self, shape_id: str) -> Optional[Tuple[str, dict]]:
+        """(command name, replayable command) last seen for `shape_id`, or None."""
+        with self._lock:
+            stats = self._stats.get(shape_id)
+            if stats is None or stats.sample is None:
+                return None
+            command = {key: value for key, value in stats.sample.items() if key not in _SESSION_FIELDS}
+            for statements in ("updates", "deletes"):
+                if statements in command:
+                    command[statements] = command[statements][:1]  # explain takes a single statement
+            return self._operations[shape_id]["command"], command
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._stats.clear()
+            self._slowest.clear()
+            self.started_at = time.time()
+
+
+query_profiler = QueryProfiler(
+    top_n=settings.QUERY_PROFILER_TOP_N,
+    slow_ms=settings.QUERY_PROFILER_SLOW_MS,
+    max_shapes=settings.QUERY_PROFILER_MAX_SHAPES,
+)
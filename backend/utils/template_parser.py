@@ -0,0 +1,192 @@
+"""
+Question detection for imported questionnaire workbooks.
+
+Kept free of database and web imports so the functions can run in worker
+processes.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+SCREENING_SHEET = "Screening"
+EVALUATION_SHEETS = [
+    'Product Attribute (Taste Test)',
+    'Purchase Intention',
+    'Overall Evaluation',
+    'Awareness & Usage Module',
+    'Shopping Behavior'
+]
+
+Row = Sequence[Any]
+
+
+def read_workbook_rows(path: str, sheet_names: List[str]) -> Dict[str, List[Row]]:
+    """
+    Opens the workbook once in read-only (streaming) mode and returns the data
+    rows of each requested sheet that exists. The first row of every sheet is
+    a header and is skipped.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = {}
+        for name in sheet_names:
+            if name not in workbook.sheetnames:
+                continue
+            rows = workbook[name].iter_rows(values_only=True)
+            next(rows, None)
+            sheets[name] = [tuple(row) for row in rows]
+        return sheets
+    finally:
+        workbook.close()
+
+
+SCREENING_CODE_PREFIXES = ("S", "D", "Q")
+EVALUATION_CODE_PREFIXES = ("Q", "PI", "OE", "AU", "SB")
+
+
+class _Cells:
+    """
+    The non-empty cells of a sheet, flattened row-major: `text` holds their
+    string values and `positions` their flat index into the (rows, columns)
+    grid. String tests run once over `text` as NumPy ufuncs and are scattered
+    back to grid masks, instead of looping over rows.
+    """
+
+    def __init__(self, rows: List[Row], strip: bool):
+        # dtype=object keeps ints as ints (no NaN upcasting) and pads ragged rows with None
+        grid = pd.DataFrame(rows, dtype=object).to_numpy()
+        flat = grid.ravel()
+        positions = np.flatnonzero(pd.notna(flat))
+        text = flat[positions].astype(str)
+        if strip:
+            text = np.char.strip(text)
+        # Blank and literal 'nan' cells count as empty
+        keep = (text != "") & (text != "nan")
+
+        self.shape = grid.shape
+        self.positions = positions[keep]
+        self.text = text[keep]
+        self.values = self.scatter(self.text.astype(object), None, object)
+        self.filled = self.scatter(True, False, bool)
+        self.lengths = self.scatter(np.char.str_len(self.text), 0, int)
+
+    def scatter(self, cell_values, fill, dtype) -> np.ndarray:
+        grid = np.full(self.shape[0] * self.shape[1], fill, dtype=dtype)
+        grid[self.positions] = cell_values
+        return grid.reshape(self.shape)
+
+    def code_mask(self, prefixes: Sequence[str], max_length: Optional[int] = None, max_column: Optional[int] = None) -> np.ndarray:
+        """Cells that start with one of `prefixes`, contain a digit and fit the length/column limits."""
+        matches = np.zeros(len(self.text), dtype=bool)
+        for prefix in prefixes:
+            matches |= np.char.startswith(self.text, prefix)
+        if max_length is not None:
+            matches &= np.char.str_len(self.text) <= max_length
+        if max_column is not None:
+            matches &= self.positions % self.shape[1] < max_column
+        # Only the remaining candidates need the per-character digit test
+        candidates = np.flatnonzero(matches)
+        matches[candidates] = [any(c.isdigit() for c in value) for value in self.text[candidates]]
+        return self.scatter(matches, False, bool)
+
+
+def _first_true(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per row: whether any cell is True, and the column of the first True cell."""
+    return mask.any(axis=1), mask.argmax(axis=1)
+
+
+def parse_screening_rows(rows: List[Row]) -> List[Dict[str, Any]]:
+    """
+    Detects screening questions (codes like S1/D1/Q1) and collects their options.
+    A code row starts a question whose label is the first later cell longer than
+    5 characters; following rows contribute short cells as options until the
+    next code row.
+    """
+    if not rows:
+        return []
+    cells = _Cells(rows, strip=True)
+    if not len(cells.text):
+        return []
+    values, filled, lengths = cells.values, cells.filled, cells.lengths
+    columns = np.arange(cells.shape[1])
+    row_index = np.arange(cells.shape[0])
+
+    is_code = cells.code_mask(SCREENING_CODE_PREFIXES, max_length=5)
+    has_code, code_col = _first_true(is_code)
+    has_label, label_col = _first_true(filled & (lengths > 5) & (columns > code_col[:, None]))
+
+    ids = values[row_index, code_col][has_code]
+    labels = np.where(has_label, values[row_index, label_col], "")[has_code]
+    if not len(ids):
+        return []
+
+    # Forward-fill: each row belongs to the most recent question above it (0 = none yet)
+    question_of_row = np.cumsum(has_code)
+    option_rows = ~has_code & (question_of_row > 0)
+    option_cells = filled & (lengths < 50) & option_rows[:, None]
+    r, c = np.nonzero(option_cells)
+    question = question_of_row[r] - 1
+    options = values[r, c]
+    keep = (options != "Instructions") & (options != ids[question]) & (options != labels[question])
+    unique = pd.DataFrame({"q": question[keep], "option": options[keep]}).drop_duplicates()
+    # Cells come out row-major, so each question's options are one contiguous run
+    owners = unique["q"].to_numpy()
+    bounds = np.flatnonzero(np.diff(owners)) + 1
+    options_by_question = dict(zip(owners[np.r_[0, bounds]], np.split(unique["option"].to_numpy(), bounds))) if len(owners) else {}
+
+    label_series = pd.Series(labels, dtype="string")
+    is_age = (label_series.str.lower().str.contains("age", regex=False) | label_series.str.contains("سن", regex=False)).to_numpy()
+
+    return [
+        {
+            "id": ids[i],
+            "label": labels[i],
+            "options": options_by_question[i].tolist() if i in options_by_question else [],
+            "type": "age" if is_age[i] else "mcq"
+        }
+        for i in range(len(ids))
+    ]
+
+
+def parse_evaluation_rows(sheet: str, rows: List[Row]) -> Optional[Dict[str, Any]]:
+    """
+    Detects evaluation questions (codes like Q1/PI1/OE1 in the first ten columns)
+    whose text is the first later cell longer than 10 characters; None if the
+    sheet has none.
+    """
+    if not rows:
+        return None
+    cells = _Cells(rows, strip=False)
+    if not len(cells.text):
+        return None
+    values, filled, lengths = cells.values, cells.filled, cells.lengths
+    columns = np.arange(cells.shape[1])
+    row_index = np.arange(cells.shape[0])
+
+    is_code = cells.code_mask(EVALUATION_CODE_PREFIXES, max_column=10)
+    has_code, code_col = _first_true(is_code)
+    has_text, text_col = _first_true(filled & (lengths > 10) & (columns > code_col[:, None]))
+
+    found = has_code & has_text
+    codes = values[row_index, code_col][found]
+    texts = values[row_index, text_col][found]
+    if not len(codes):
+        return None
+
+    text_series = pd.Series(texts, dtype="string")
+    is_scale = (text_series.str.contains("مدى", regex=False) | text_series.str.lower().str.contains("scale", regex=False)).to_numpy()
+
+    return {
+        "title": sheet,
+        "questions": [
+            {
+                "id": f"{sheet}_{code}",
+                "text": text,
+                "type": "scale" if scale else "mcq",
+                "options": ["1", "2", "3", "4", "5"]
+            }
+            for code, text, scale in zip(codes, texts, is_scale)
+        ]
+    }
@@ -0,0 +1,114 @@
+import hashlib
+import hmac
+import re
+import secrets
+import uuid
+from typing import Optional
+
+from backend.config import settings
+from backend.utils.logging_utils import logger
+
+# Crockford base32: case-insensitive and free of I/L/O/U look-alikes
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+_DECODE.update({"I": 1, "L": 1, "O": 0})
+
+SHARD_BYTES = 2
+RANDOM_BYTES = 7
+MAC_BYTES = 3
+TOKEN_BYTES = SHARD_BYTES + RANDOM_BYTES + MAC_BYTES
+TOKEN_LENGTH = (TOKEN_BYTES * 8 + 4) // 5
+
+# Formats issued before the codec: full uuid4 strings and uuid4()[:12].upper()
+_LEGACY_RE = re.compile(
+    r"^(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9A-F]{8}-[0-9A-F]{3})$"
+)
+
+
+def enabled() -> bool:
+    """Codec tokens are issued and accepted only once TOKEN_CODEC_SECRET is set."""
+    return bool(settings.TOKEN_CODEC_SECRET)
+
+
+def check_config():
+    """
+    Startup check: without TOKEN_CODEC_SECRET no token format would be
+    accepted unless pre-codec tokens are, so that combination refuses to start.
+    """
+    if enabled():
+        return
+    if not settings.TOKEN_ACCEPT_LEGACY:
+        raise RuntimeError("TOKEN_CODEC_SECRET must be set when TOKEN_ACCEPT_LEGACY is false")
+    logger.warning("TOKEN_CODEC_SECRET is not set: issuing and accepting pre-codec tokens only")
+
+
+def _mac_key() -> bytes:
+    return settings.TOKEN_CODEC_SECRET.encode("utf-8")
+
+
+def _mac(body: bytes) -> bytes:
+    return hmac.new(_mac_key(), body, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+def shard_for(survey_id: str) -> bytes:
+    """Stable 2-byte prefix for a survey, so a survey's tokens cluster in the index."""
+    return hashlib.sha256(str(survey_id).encode("utf-8")).digest()[:SHARD_BYTES]
+
+
+def _decode(token: str) -> Optional[bytes]:
+    """The 12 bytes a codec token spells (shard + body + MAC), or None if it isn't one."""
+    token = token.strip().upper().replace("-", "")
+    if len(token) != TOKEN_LENGTH:
+        return None
+    value = 0
+    for char in token:
+        digit = _DECODE.get(char)
+        if digit is None:
+            return None
+        value = (value << 5) | digit
+    if value >> (TOKEN_BYTES * 8):
+        return None
+    return value.to_bytes(TOKEN_BYTES, "big")
+
+
+def _encode(raw: bytes) -> str:
+    """Spells 12 token bytes in base32."""
+    value = int.from_bytes(raw, "big")
+    return "".join(
+        ALPHABET[(value >> (5 * (TOKEN_LENGTH - 1 - i))) & 31] for i in range(TOKEN_LENGTH)
+    )
+
+
+def generate(survey_id: str) -> str:
+    """Issues a new token: shard prefix + random body + truncated HMAC (pre-codec format without a secret)."""
+    if not enabled():
+        return str(uuid.uuid4())[:12].upper()
+    body = shard_for(survey_id) + secrets.token_bytes(RANDOM_BYTES)
+    return _encode(body + _mac(body))
+
+
+def normalize(token: str) -> str:
+    """Canonical spelling of a codec token (fixes case and look-alike typos); legacy tokens pass through."""
+    raw = _decode(token)
+    return _encode(raw) if raw is not None else token
+
+
+def verify(token: str) -> bool:
+    """True if `token` is a codec token with a valid checksum."""
+    raw = _decode(token)
+    if raw is None or not enabled():
+        return False
+    body, mac = raw[:-MAC_BYTES], raw[-MAC_BYTES:]
+    return hmac.compare_digest(mac, _mac(body))
+
+
+def is_plausible(token: str) -> bool:
+    """
+    Cheap pre-check before any database lookup: accepts checksummed codec tokens
+    and, while TOKEN_ACCEPT_LEGACY is on, tokens in the pre-codec formats.
+    """
+    if not isinstance(token, str) or not token or len(token) > 64:
+        return False
+    if verify(token):
+        return True
+    return settings.TOKEN_ACCEPT_LEGACY and bool(_LEGACY_RE.match(token))
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
-import { templates, surveys } from '../services/api';
+import { templates, surveys, tokens } from '../services/api';
 import {
   ArrowLeft,
   Sparkles,
@@ -36,6 +36,7 @@ export default function CreateSurvey() {
   });
   const [loading, setLoading] = useState(false);
   const [successData, setSuccessData] = useState<any>(null);
+  const [downloading, setDownloading] = useState(false);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -160,7 +161,7 @@ export default function CreateSurvey() {
                 <div className="flex-1 overflow-y-auto p-10 space-y-8 custom-scrollbar text-left">
                   <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
                     <StatCard label="Survey ID" value={successData._id.slice(-8).toUpperCase()} sub="Provisioned ID" />
-                    <StatCard label="Link Count" value={successData.generated_tokens?.length || 0} sub="Unique Keys" />
+                    <StatCard label="Link Count" value={successData.generated_tokens?.length ?? successData.link_count ?? 0} sub="Unique Keys" />
                     <StatCard label="Security" value="One-Time" sub="State Invalidation" />
                   </div>
 
@@ -168,21 +169,40 @@ export default function CreateSurvey() {
                     <div className="flex items-center justify-between">
                       <h4 className="text-[10px] font-black uppercase tracking-widest text-slate-400">Access Key Registry</h4>
                       <button
-                        onClick={() => {
-                          const blob = new Blob([successData.generated_tokens.map((t: string) => `${window.location.origin}/s/${t}`).join('\n')], { type: 'text/plain' });
-                          const url = window.URL.createObjectURL(blob);
-                          const a = document.createElement('a');
-                          a.href = url;
-                          a.download = `survey-links-${successData._id.slice(-6)}.txt`;
-                          a.click();
-                          toast.success('Registry downloaded');
+                        disabled={downloading}
+                        onClick={async () => {
+                          setDownloading(true);
+                          try {
+                            // Large orders only return their batch id; fetch the tokens from the batch export
+                            const keys: string[] = successData.generated_tokens
+                              ?? (successData.token_batch_id ? await tokens.exportBatch(successData.token_batch_id) : []);
+                            const blob = new Blob([keys.map((t: string) => `${window.location.origin}/s/${t}`).join('\n')], { type: 'text/plain' });
+                            const url = window.URL.createObjectURL(blob);
+                            const a = document.createElement('a');
+                            a.href = url;
+                            a.download = `survey-links-${successData._id.slice(-6)}.txt`;
+                            a.click();
+                            window.URL.revokeObjectURL(url);
+                            toast.success('Registry downloaded');
+                          } catch (err) {
+                            console.error(err);
+                            toast.error('Failed to download links');
+                          } finally {
+                            setDownloading(false);
+                          }
                         }}
-                        className="flex items-center gap-2 text-[10px] font-black uppercase tracking-widest text-brand-blue hover:text-blue-700 transition-colors"
+                        className="flex items-center gap-2 text-[10px] font-black uppercase tracking-widest text-brand-blue hover:text-blue-700 transition-colors disabled:opacity-50"
                       >
                         <Download className="w-3 h-3" />
-                        Download List
+                        {downloading ? 'Preparing...' : 'Download List'}
                       </button>
                     </div>
+                    {!successData.generated_tokens && successData.link_count > 0 && (
+                      <div className="flex items-center gap-3 p-4 rounded-2xl bg-slate-50 border border-slate-100 text-xs font-medium text-slate-500">
+                        <AlertCircle className="w-4 h-4 shrink-0 text-brand-blue" />
+                        {successData.link_count.toLocaleString()} links were generated, too many to list here. Use Download List to get all of them.
+                      </div>
+                    )}
                     <div className="space-y-3">
                       {successData.generated_tokens?.map((token: string, idx: number) => {
                         const url = `${window.location.origin}/s/${token}`;
@@ -67,7 +67,17 @@ export const templates = {
 };
 
 export const surveys = {
-  list: async () => (await api.get('/surveys/')).data,
+  list: async () => {
+    // The API pages survey summaries by cursor; callers get every page as one array
+    const items: any[] = [];
+    let cursor: string | undefined;
+    do {
+      const { data } = await api.get('/surveys/', { params: { cursor, page_size: 500 } });
+      items.push(...data.items);
+      cursor = data.next_cursor ?? undefined;
+    } while (cursor);
+    return items;
+  },
   create: async (data: any) => (await api.post('/surveys/', data)).data,
   get: async (id: string) => (await api.get(`/surveys/${id}`)).data,
   update: async (id: string, data: any) => (await api.put(`/surveys/${id}`, data)).data,
@@ -84,6 +94,14 @@ export const tokens = {
     (await api.post('/tokens/bulk-update', data)).data,
   getSummary: async (surveyId: string) =>
     (await api.get(`/tokens/survey/${surveyId}/summary`)).data,
+  // Every token of a generation batch (large survey orders don't return them inline)
+  exportBatch: async (batchId: string): Promise<string[]> => {
+    const { data } = await api.get(`/tokens/batch/${batchId}/export`, {
+      params: { format: 'csv' },
+      responseType: 'text'
+    });
+    return (data as string).split('\n').slice(1).filter(Boolean).map(row => row.split(',')[0]);
+  },
 };
 
 export const analytics = {
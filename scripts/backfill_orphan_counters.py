@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+
+# Add working directory to sys.path to find backend
+sys.path.append(os.getcwd())
+
+from backend.database import db
+
+async def backfill_orphan_counters():
+    """
+    Rebuilds `orphan_counters` from the raw `orphan_submissions` still held.
+    Every raw record also bumped its counter, so replacing a minute's counter
+    with the recount is idempotent.
+    """
+    db.connect()
+    try:
+        pipeline = [
+            {"$group": {
+                "_id": {
+                    "reason": "$reason",
+                    "minute": {"$dateTrunc": {"date": "$timestamp", "unit": "minute"}}
+                },
+                "count": {"$sum": 1},
+                "latest": {"$max": "$timestamp"}
+            }},
+            {"$project": {
+                "_id": {"$concat": [
+                    "$_id.reason", "|",
+                    {"$dateToString": {"date": "$_id.minute", "format": "%Y-%m-%dT%H:%M:%S"}}
+                ]},
+                "reason": "$_id.reason",
+                "minute": "$_id.minute",
+                "count": 1,
+                "latest": 1
+            }},
+            {"$merge": {"into": "orphan_counters", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+        await db.get_collection("orphan_submissions").aggregate(pipeline).to_list(None)
+        total = await db.get_collection("orphan_counters").count_documents({})
+        print(f"orphan_counters now holds {total} minute bucket(s).")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # Usage: python scripts/backfill_orphan_counters.py
+    asyncio.run(backfill_orphan_counters())
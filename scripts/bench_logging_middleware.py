@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Callable
+
+# Add working directory to sys.path to find backend
+sys.path.append(os.getcwd())
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from backend.utils import logging_utils
+from backend.utils.logging_utils import LoggingMiddleware, logger
+
+STREAM_CHUNKS = 100
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation this benchmark compares against."""
+
+    async def dispatch(self, request: Request, call_next: Callable):
+        start_time = time.time()
+        method = request.method
+        url = request.url.path
+        client_host = request.client.host if request.client else "unknown"
+        logger.info(f"Incoming request: {method} {url} from {client_host}")
+        response = await call_next(request)
+        process_time = (time.time() - start_time) * 1000
+        logger.info(
+            f"Completed request: {method} {url} - Status: {response.status_code} - Duration: {process_time:.2f}ms"
+        )
+        return response
+
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(STREAM_CHUNKS):
+                yield f"{i}\n"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return app
+
+
+async def call(app, path: str):
+    """Drives one request straight through the ASGI interface (no server, no sockets)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if body_sent:
+            # Streaming responses listen for a disconnect that never comes
+            await asyncio.Event().wait()
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def bench(name: str, app, path: str, requests: int, baseline: float = None) -> float:
+    for _ in range(200):  # warm up
+        await call(app, path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, path)
+    per_request = (time.perf_counter() - start) / requests * 1e6
+    overhead = f"   overhead {per_request - baseline:7.1f} us" if baseline is not None else ""
+    print(f"{name:<28} {per_request:8.1f} us/request{overhead}")
+    return per_request
+
+
+async def main(requests: int):
+    # Logs go to /dev/null so the numbers measure the middleware, not the terminal
+    devnull = open(os.devnull, "w")
+    logging_utils.setup_logging(stream=devnull)
+    try:
+        for label, path in (("json", "/items/42"), (f"stream x{STREAM_CHUNKS}", "/stream")):
+            print(f"-- {label} ({requests} requests)")
+            baseline = await bench("no middleware", build_app(), path, requests)
+            await bench("BaseHTTPMiddleware (old)", build_app(LegacyLoggingMiddleware), path, requests, baseline)
+            await bench("pure ASGI (sampled)", build_app(LoggingMiddleware), path, requests, baseline)
+    finally:
+        logging_utils.shutdown_logging()
+        devnull.close()
+
+
+if __name__ == "__main__":
+    # Usage: python scripts/bench_logging_middleware.py [requests]
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,61 @@
+import os
+import random
+import sys
+import time
+
+# Add working directory to sys.path to find backend
+sys.path.append(os.getcwd())
+
+from backend.utils import template_parser
+
+COLUMNS = 12
+
+
+def screening_rows(count, seed=7):
+    """Synthetic Screening sheet: a code row every ~6 rows followed by option rows."""
+    rng = random.Random(seed)
+    rows = []
+    q = 0
+    while len(rows) < count:
+        q += 1
+        rows.append((f"S{q}", None, f"Screening question number {q}?") + (None,) * (COLUMNS - 3))
+        for o in range(rng.randint(2, 8)):
+            row = [None] * COLUMNS
+            row[2] = f"Option {o + 1}"
+            row[3] = o + 1
+            rows.append(tuple(row))
+    return rows[:count]
+
+
+def evaluation_rows(count, seed=11):
+    """Synthetic evaluation sheet: mostly question rows with some noise rows."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        row = [None] * COLUMNS
+        if rng.random() < 0.7:
+            row[rng.randint(0, 3)] = f"Q{i + 1}"
+            row[5] = f"How would you rate attribute {i} on a 1-5 scale?"
+        else:
+            row[0] = "Note"
+        rows.append(tuple(row))
+    return rows
+
+
+def bench(name, fn, *args, repeat=5):
+    fn(*args)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f"{name:<12} best {best * 1000:8.1f} ms   median {sorted(timings)[len(timings) // 2] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    # Usage: python scripts/bench_template_parser.py [rows]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"{count} rows x {COLUMNS} columns")
+    bench("screening", template_parser.parse_screening_rows, screening_rows(count))
+    bench("evaluation", template_parser.parse_evaluation_rows, "Purchase Intention", evaluation_rows(count))
@@ -28,7 +28,11 @@ async def dump():
     for s in surveys:
         print(f"ID: {s['_id']} | Company: {s.get('company_name')} | Status: {s.get('status')}")
         print(f"  Tokens: {len(s.get('generated_tokens', []))} tokens stored")
-        print(f"  Snapshot Qs: {len(s.get('template_snapshot_questions', []))} questions")
+        if s.get('template_snapshot_id'):
+            snapshot = await db['template_snapshots'].find_one({'_id': s['template_snapshot_id']}) or {}
+            print(f"  Snapshot Qs: {len(snapshot.get('questions', []))} questions (snapshot {s['template_snapshot_id'][:12]})")
+        else:
+            print(f"  Snapshot Qs: {len(s.get('template_snapshot_questions', []))} questions")
         print(f"  Link Count (requested): {s.get('link_count')}")
         print("---")
 
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sys
+
+# Add working directory to sys.path to find backend
+sys.path.append(os.getcwd())
+
+from backend.database import db
+from backend.services.snapshot_service import SNAPSHOT_FIELDS, snapshot_service
+
+async def migrate_snapshots(dry_run=False):
+    """Moves inline survey snapshots into `template_snapshots` and leaves a reference behind."""
+    db.connect()
+    try:
+        surveys_col = db.get_collection("surveys")
+        cursor = surveys_col.find(
+            {SNAPSHOT_FIELDS["questions"]: {"$exists": True}},
+            {field: 1 for field in SNAPSHOT_FIELDS.values()}
+        )
+        migrated = 0
+        distinct = set()
+        async for survey in cursor:
+            snapshot_id = await snapshot_service.store(
+                survey.get(SNAPSHOT_FIELDS["schema"]),
+                survey.get(SNAPSHOT_FIELDS["questions"]),
+                survey.get(SNAPSHOT_FIELDS["l2"])
+            )
+            distinct.add(snapshot_id)
+            if not dry_run:
+                await surveys_col.update_one(
+                    {"_id": survey["_id"]},
+                    {
+                        "$set": {"template_snapshot_id": snapshot_id},
+                        "$unset": {field: "" for field in SNAPSHOT_FIELDS.values()}
+                    }
+                )
+            migrated += 1
+        print(f"{'Would migrate' if dry_run else 'Migrated'} {migrated} survey(s) into {len(distinct)} snapshot(s).")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # Usage: python scripts/migrate_survey_snapshots.py [--dry-run]
+    asyncio.run(migrate_snapshots(dry_run="--dry-run" in sys.argv))
@@ -0,0 +1,21 @@
+import asyncio
+import os
+import sys
+
+# Add working directory to sys.path to find backend
+sys.path.append(os.getcwd())
+
+from backend.database import db
+from backend.services.stats_service import survey_stats_service
+
+async def rebuild_stats(survey_id=None):
+    db.connect()
+    try:
+        rebuilt = await survey_stats_service.rebuild(survey_id)
+        print(f"Rebuilt survey_stats for {rebuilt} survey(s).")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # Usage: python scripts/rebuild_survey_stats.py [survey_id]
+    asyncio.run(rebuild_stats(sys.argv[1] if len(sys.argv) > 1 else None))